@@ -1,6 +1,6 @@
 # api/admin.py
 from django.contrib import admin
-from .models import Dataset, Equipment
+from .models import Dataset, Equipment, IngestJob, TypeSummary
 
 
 @admin.register(Dataset)
@@ -25,4 +25,24 @@ class EquipmentAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.select_related('dataset')
\ No newline at end of file
+        return qs.select_related('dataset')
+
+@admin.register(IngestJob)
+class IngestJobAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'status', 'rows_parsed', 
+                    'rows_inserted', 'dataset', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['filename', 'user__username']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(TypeSummary)
+class TypeSummaryAdmin(admin.ModelAdmin):
+    list_display = ['equipment_type', 'dataset', 'count', 'flowrate_mean', 
+                    'pressure_mean', 'temperature_mean']
+    list_filter = ['equipment_type']
+    search_fields = ['equipment_type']
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('dataset')
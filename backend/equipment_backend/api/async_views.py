@@ -0,0 +1,192 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from functools import wraps
+from rest_framework import exceptions, status
+from .authentication import CachedTokenAuthentication
+from .conditional import (
+    async_condition, dataset_etag, dataset_last_modified, dataset_list_etag,
+    dataset_list_last_modified, report_etag
+)
+from .models import Dataset, TypeSummary
+from .renderers import FastJSONRenderer
+from .report_cache import open_report
+from .report_pool import ReportTimeout
+from .retention import retained_datasets
+from .serializers import DatasetListSerializer, DatasetSerializer, TypeSummarySerializer
+from .utils import DETAIL_LEVELS
+from .views import process_batch_upload, process_upload
+import asyncio
+import os
+
+
+# Async versions of the upload, report and dataset read endpoints, for
+# ASGI deployments (see API_ASYNC_VIEWS). The event loop only waits on
+# clients; database work, CSV parsing and serialization run in worker
+# threads through sync_to_async and reports render in the report pool.
+# Responses match the DRF views in views.py.
+
+REPORT_CHUNK_SIZE = 64 * 1024
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status_code,
+        content_type='application/json',
+        headers=headers
+    )
+
+
+def _not_found():
+    return json_response({'error': 'Dataset not found'}, status.HTTP_404_NOT_FOUND)
+
+
+def async_api_view(view):
+    """Token authentication for async views, answering 401 like DRF does"""
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        authenticator = CachedTokenAuthentication()
+        try:
+            auth = await sync_to_async(authenticator.authenticate)(request)
+            if auth is None:
+                raise exceptions.NotAuthenticated()
+        except exceptions.APIException as e:
+            return json_response(
+                {'detail': e.detail},
+                status.HTTP_401_UNAUTHORIZED,
+                {'WWW-Authenticate': authenticator.authenticate_header(request)}
+            )
+        request.user, request.auth = auth
+        return await view(request, *args, **kwargs)
+    # Token authentication is not open to CSRF, same as the DRF views
+    return csrf_exempt(inner)
+
+
+@async_api_view
+@require_POST
+async def upload_csv(request):
+    """
+    Upload and process CSV file.
+    The request body has already been read without holding a thread; the
+    multipart parsing and the ingest run in a worker thread.
+    """
+    def upload():
+        return process_upload(request, request.FILES.get('file'))
+
+    data, status_code, headers = await sync_to_async(upload)()
+    return json_response(data, status_code, headers)
+
+
+@async_api_view
+@require_POST
+async def batch_upload(request):
+    """Upload several CSV files or ZIP archives; parsing and inserts run in a worker thread"""
+    data, status_code = await sync_to_async(process_batch_upload)(request)
+    return json_response(data, status_code)
+
+
+@async_api_view
+@require_GET
+@async_condition(etag_func=dataset_list_etag, last_modified_func=dataset_list_last_modified)
+async def dataset_list(request):
+    """Get list of the user's datasets kept by the retention policy"""
+    datasets = [dataset async for dataset in retained_datasets(request.user)]
+    return json_response(DatasetListSerializer(datasets, many=True).data)
+
+
+@async_api_view
+@require_GET
+@async_condition(etag_func=dataset_etag, last_modified_func=dataset_last_modified)
+async def dataset_detail(request, pk):
+    """Get detailed dataset with equipment data"""
+    try:
+        dataset = await Dataset.objects.aget(pk=pk, user=request.user)
+    except Dataset.DoesNotExist:
+        return _not_found()
+
+    # Equipment rows are read and encoded off the event loop
+    def render():
+        return FastJSONRenderer().render(DatasetSerializer(dataset).data)
+
+    return HttpResponse(await sync_to_async(render)(), content_type='application/json')
+
+
+@async_api_view
+@require_GET
+async def dataset_summary(request, pk):
+    """Get dataset statistics without equipment data"""
+    try:
+        dataset = await Dataset.objects.aget(pk=pk, user=request.user)
+    except Dataset.DoesNotExist:
+        return _not_found()
+    return json_response(DatasetListSerializer(dataset).data)
+
+
+@async_api_view
+@require_GET
+async def dataset_stats(request, pk):
+    """Get per equipment type statistics computed when the dataset was ingested"""
+    try:
+        dataset = await Dataset.objects.aget(pk=pk, user=request.user)
+    except Dataset.DoesNotExist:
+        return _not_found()
+
+    summaries = [summary async for summary in TypeSummary.objects.filter(dataset=dataset)]
+    return json_response({
+        'id': dataset.id,
+        'total_count': dataset.total_count,
+        'avg_flowrate': dataset.avg_flowrate,
+        'avg_pressure': dataset.avg_pressure,
+        'avg_temperature': dataset.avg_temperature,
+        'types': TypeSummarySerializer(summaries, many=True).data,
+    })
+
+
+async def _read_chunks(report):
+    """Send an open report file in chunks, reading each off the event loop"""
+    try:
+        while chunk := await asyncio.to_thread(report.read, REPORT_CHUNK_SIZE):
+            yield chunk
+    finally:
+        report.close()
+
+
+@async_api_view
+@require_GET
+@async_condition(etag_func=report_etag, last_modified_func=dataset_last_modified)
+async def generate_report(request, pk):
+    """Generate PDF report for a dataset"""
+    detail = request.GET.get('detail', 'summary')
+    if detail not in DETAIL_LEVELS:
+        return json_response(
+            {'error': f"detail must be one of: {', '.join(DETAIL_LEVELS)}"},
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        dataset = await Dataset.objects.aget(pk=pk, user=request.user)
+
+        # Reuse the cached PDF unless the dataset changed; a thread waits
+        # for the render pool so the event loop does not
+        report = await sync_to_async(open_report)(dataset, detail)
+    except Dataset.DoesNotExist:
+        return _not_found()
+    except ReportTimeout as e:
+        return json_response({'error': str(e)}, status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        return json_response(
+            {'error': f'Error generating report: {str(e)}'},
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    size = report.seek(0, os.SEEK_END)
+    report.seek(0)
+    response = StreamingHttpResponse(_read_chunks(report), content_type='application/pdf')
+    response['Content-Length'] = size
+    response['Content-Disposition'] = content_disposition_header(
+        True, f'report_{dataset.filename}.pdf'
+    )
+    return response
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from rest_framework.authentication import TokenAuthentication
+import threading
+import time
+
+
+DEFAULT_TTL = 5
+DEFAULT_MAX_SIZE = 1024
+
+
+class TokenCache:
+    """
+    In-process LRU cache of token key -> (user, token) with a time to live.
+    Each process has its own copy; revocations made in other processes
+    reach it through markers in Django's cache (see is_revoked), and
+    entries are dropped after TTL seconds in any case.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (expires_at, user, token, cached_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2], entry[3]
+
+    def set(self, key, user, token):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user, token, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[1].pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """Return the process-wide token cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TokenCache(
+                getattr(settings, 'AUTH_TOKEN_CACHE_TTL', DEFAULT_TTL),
+                getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', DEFAULT_MAX_SIZE),
+            )
+        return _cache
+
+
+def _token_marker(key):
+    return f'auth-token-revoked:{key}'
+
+
+def _user_marker(user_id):
+    return f'auth-user-changed:{user_id}'
+
+
+def revoke_token(key):
+    """Stop accepting a cached token in this process and, through a marker, in the others"""
+    get_token_cache().invalidate(key)
+    shared_cache.set(_token_marker(key), True, get_token_cache().ttl)
+
+
+def revoke_user(user_id):
+    """Drop a user's cached tokens in this process and, through a marker, in the others"""
+    get_token_cache().invalidate_user(user_id)
+    shared_cache.set(_user_marker(user_id), time.time(), get_token_cache().ttl)
+
+
+def is_revoked(key, user_id, cached_at):
+    """
+    Whether another process revoked the token or changed its user after
+    the lookup was cached. Only seen across processes when CACHES is
+    shared (e.g. Redis or Memcached); with the default per-process cache
+    other processes keep the entry for up to AUTH_TOKEN_CACHE_TTL seconds.
+    """
+    markers = shared_cache.get_many([_token_marker(key), _user_marker(user_id)])
+    changed_at = markers.get(_user_marker(user_id))
+    return _token_marker(key) in markers or (changed_at is not None and changed_at >= cached_at)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that remembers successful token lookups, so
+    repeat requests with the same token skip the token/user query.
+    Entries are invalidated when a token is deleted or its user changes
+    (see signals.py).
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            user, token, cached_at = cached
+            if not is_revoked(key, user.pk, cached_at):
+                return user, token
+            cache.invalidate(key)
+
+        user, token = super().authenticate_credentials(key)
+        cache.set(key, user, token)
+        return user, token
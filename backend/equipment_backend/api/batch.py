@@ -0,0 +1,157 @@
+from django.conf import settings
+from .ingest import find_duplicate, get_content_hash, ingest_spooled
+from .parse_pool import parse_csvs
+from .profiling import span
+from .retention import enforce_retention
+import hashlib
+import logging
+import os
+import tempfile
+import zipfile
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_FILES = 50
+# Uncompressed size all CSVs of one batch may add up to
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+
+class BatchError(ValueError):
+    """Raised when a batch upload as a whole is rejected"""
+
+
+def _spool(source, spool_dir, budget):
+    """
+    Copy a file object into spool_dir, hashing it on the way. Reads at
+    most budget + 1 bytes so an oversized (or lying) ZIP member is caught
+    early. Returns (path, size, content_hash).
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=spool_dir, suffix='.csv', delete=False) as out:
+        while size <= budget:
+            block = source.read(min(SPOOL_BLOCK_SIZE, budget + 1 - size))
+            if not block:
+                break
+            hasher.update(block)
+            out.write(block)
+            size += len(block)
+    return out.name, size, hasher.hexdigest()
+
+
+def collect_csvs(uploaded_files, spool_dir):
+    """
+    Return (filename, path, content_hash) for every CSV in the upload,
+    expanding ZIP archives. Uploads already on disk are used in place;
+    in-memory uploads and ZIP members are spooled to spool_dir, so the
+    batch is never held in memory. Other files are returned with a None
+    path so they show up as errors in the results.
+    """
+    max_files = getattr(settings, 'BATCH_UPLOAD_MAX_FILES', DEFAULT_MAX_FILES)
+    budget = getattr(settings, 'BATCH_UPLOAD_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+    csvs = []
+    for uploaded in uploaded_files:
+        if uploaded.name.endswith('.csv'):
+            budget -= uploaded.size
+            if budget < 0:
+                raise BatchError('Batch is too large')
+            if hasattr(uploaded, 'temporary_file_path'):
+                path = uploaded.temporary_file_path()
+            else:
+                path, _, _ = _spool(uploaded, spool_dir, uploaded.size)
+            csvs.append((uploaded.name, path, get_content_hash(uploaded)))
+        elif uploaded.name.endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(uploaded)
+            except zipfile.BadZipFile:
+                raise BatchError(f'{uploaded.name} is not a valid ZIP archive')
+            with archive:
+                for info in archive.infolist():
+                    name = os.path.basename(info.filename)
+                    if info.is_dir() or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                        continue
+                    if not name.endswith('.csv'):
+                        csvs.append((name, None, ''))
+                        continue
+                    with archive.open(info) as member:
+                        path, size, content_hash = _spool(member, spool_dir, budget)
+                    budget -= size
+                    if budget < 0:
+                        raise BatchError('Batch is too large once unzipped')
+                    csvs.append((name, path, content_hash))
+        else:
+            csvs.append((uploaded.name, None, ''))
+
+        if len(csvs) > max_files:
+            raise BatchError(f'A batch may contain at most {max_files} files')
+
+    if not csvs:
+        raise BatchError('No file provided')
+    return csvs
+
+
+def ingest_batch(uploaded_files, user, serialize):
+    """
+    Ingest every CSV of a batch upload as its own Dataset.
+
+    Files are parsed in parallel in the parse pool and inserted here one
+    at a time, in upload order, while later files are still being parsed.
+    Retention runs once at the end. Returns a result per file;
+    serialize(dataset) builds the 'dataset' entry of created and duplicate
+    files.
+    """
+    with tempfile.TemporaryDirectory(dir=settings.FILE_UPLOAD_TEMP_DIR) as spool_dir:
+        csvs = collect_csvs(uploaded_files, spool_dir)
+        results, created = _ingest_files(csvs, user, serialize, spool_dir)
+
+    if created:
+        with span('retention'):
+            enforce_retention(user)
+
+    for result in created:
+        result['dataset'] = serialize(result['dataset'])
+    return results
+
+
+def _ingest_files(csvs, user, serialize, spool_dir):
+    """Ingest the collected CSVs; returns all results and those of created datasets"""
+    results = []
+    pending = []
+    seen = {}
+    for filename, path, content_hash in csvs:
+        result = {'filename': filename}
+        results.append(result)
+        if path is None:
+            result.update(status='error', error='File must be a CSV')
+        elif content_hash in seen:
+            result.update(status='duplicate', duplicate_of=seen[content_hash])
+        elif duplicate := find_duplicate(user, content_hash):
+            result.update(status='duplicate', dataset=serialize(duplicate))
+        else:
+            seen[content_hash] = filename
+            chunks_path = os.path.join(spool_dir, f'{len(pending)}.chunks')
+            pending.append((result, (path, chunks_path), content_hash))
+
+    # Workers parse the files and spool the parsed chunks next to them;
+    # this process only inserts those, in upload order, while later files
+    # are still being parsed
+    parsed = parse_csvs([paths for _, paths, _ in pending])
+
+    created = []
+    for (result, (_, chunks_path), content_hash), (stats, error) in zip(pending, parsed):
+        if error:
+            result.update(status='error', error=error)
+            continue
+        try:
+            dataset = ingest_spooled(chunks_path, stats, user, result['filename'], content_hash)
+        except Exception as e:
+            logger.exception('Inserting %s failed', result['filename'])
+            result.update(status='error', error=f'Error processing CSV: {str(e)}')
+            continue
+        result.update(status='created', dataset=dataset)
+        created.append(result)
+    return results, created
+
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.db.models import Avg, Count, F, Max, Q
+from .models import Equipment, TypeSummary
+
+
+PARAMETERS = ['flowrate', 'pressure', 'temperature']
+
+DEFAULT_MAX_DATASETS = 5
+
+
+def get_max_datasets():
+    return getattr(settings, 'DATASET_COMPARE_MAX', DEFAULT_MAX_DATASETS)
+
+
+def _pivot(grouped, key, dataset_ids, columns):
+    """
+    Turn per-dataset rows into one row per key with a value per dataset,
+    in a single grouped query. grouped is a queryset grouped by key and
+    columns maps an output name to a function building its aggregate from
+    a dataset filter. Deltas against the first dataset are computed in the
+    same query. Each output row maps name -> list in dataset order.
+    """
+    base = dataset_ids[0]
+    annotations = {
+        f'{name}_{dataset_id}': aggregate(Q(dataset_id=dataset_id))
+        for name, aggregate in columns.items()
+        for dataset_id in dataset_ids
+    }
+    deltas = {
+        f'{name}_delta_{dataset_id}': F(f'{name}_{dataset_id}') - F(f'{name}_{base}')
+        for name in columns
+        for dataset_id in dataset_ids[1:]
+    }
+
+    result = []
+    for row in grouped.annotate(**annotations).annotate(**deltas).order_by(key):
+        entry = {key: row[key]}
+        for name in columns:
+            entry[name] = [row[f'{name}_{dataset_id}'] for dataset_id in dataset_ids]
+            entry[f'{name}_delta'] = [None] + [
+                row[f'{name}_delta_{dataset_id}'] for dataset_id in dataset_ids[1:]
+            ]
+        result.append(entry)
+    return result
+
+
+def compare_datasets(datasets):
+    """
+    Compare datasets side by side; the first one is the baseline deltas
+    are taken against.
+    Aggregates come from the datasets and their type summaries, and the
+    per-equipment values are averaged per equipment_name in the database
+    (equipment present in at least two of the datasets).
+    """
+    dataset_ids = [dataset.id for dataset in datasets]
+    base = datasets[0]
+
+    summary = []
+    for dataset in datasets:
+        entry = {
+            'id': dataset.id,
+            'filename': dataset.filename,
+            'upload_date': dataset.upload_date,
+            'total_count': dataset.total_count,
+        }
+        for parameter in PARAMETERS:
+            value = getattr(dataset, f'avg_{parameter}')
+            entry[f'avg_{parameter}'] = value
+            entry[f'avg_{parameter}_delta'] = (
+                None if dataset is base else value - getattr(base, f'avg_{parameter}')
+            )
+        summary.append(entry)
+
+    type_columns = {'count': lambda condition: Max('count', filter=condition)}
+    for parameter in PARAMETERS:
+        type_columns[f'{parameter}_mean'] = (
+            lambda condition, field=f'{parameter}_mean': Max(field, filter=condition)
+        )
+    types = _pivot(
+        TypeSummary.objects.filter(dataset_id__in=dataset_ids).values('equipment_type'),
+        'equipment_type', dataset_ids, type_columns
+    )
+
+    equipment_columns = {
+        parameter: lambda condition, field=parameter: Avg(field, filter=condition)
+        for parameter in PARAMETERS
+    }
+    # Uses the (dataset, equipment_name) index
+    shared = (
+        Equipment.objects
+        .filter(dataset_id__in=dataset_ids)
+        .values('equipment_name')
+        .annotate(dataset_count=Count('dataset_id', distinct=True))
+        .filter(dataset_count__gte=2)
+    )
+    equipment = _pivot(shared, 'equipment_name', dataset_ids, equipment_columns)
+
+    return {
+        'baseline': base.id,
+        'datasets': summary,
+        'types': types,
+        'equipment': equipment,
+    }
@@ -0,0 +1,95 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+from functools import wraps
+from .models import Dataset
+from .report_cache import REPORT_VERSION
+from .retention import retained_datasets
+import hashlib
+
+
+# ETag / Last-Modified functions for django.views.decorators.http.condition.
+# Each resource is looked up with a single values_list query that is
+# remembered on the request, so a matching If-None-Match is answered with
+# 304 before any model instance or serializer is created.
+
+def _lookup(request, key, query):
+    states = request.__dict__.setdefault('_conditional_states', {})
+    if key not in states:
+        states[key] = query()
+    return states[key]
+
+
+def _dataset_state(request, pk):
+    return _lookup(request, ('dataset', pk), lambda: (
+        Dataset.objects
+        .filter(pk=pk, user=request.user)
+        .values_list('version', 'updated_at')
+        .first()
+    ))
+
+
+def dataset_etag(request, pk):
+    state = _dataset_state(request, pk)
+    if state is None:
+        return None
+    return f'dataset-{pk}-v{state[0]}'
+
+
+def dataset_last_modified(request, pk):
+    state = _dataset_state(request, pk)
+    return state[1] if state else None
+
+
+def report_etag(request, pk):
+    state = _dataset_state(request, pk)
+    if state is None:
+        return None
+    detail = request.GET.get('detail', 'summary')
+    return f'report-{pk}-v{state[0]}-r{REPORT_VERSION}-{detail}'
+
+
+def _dataset_list_state(request):
+    def query():
+        rows = list(retained_datasets(request.user).values_list('id', 'version', 'updated_at'))
+        digest = hashlib.sha1(
+            repr([(pk, version) for pk, version, _ in rows]).encode('utf-8')
+        ).hexdigest()[:16]
+        last_modified = max((updated for _, _, updated in rows), default=None)
+        return f'datasets-{request.user.pk}-{digest}', last_modified
+    return _lookup(request, ('dataset_list',), query)
+
+
+def dataset_list_etag(request):
+    return _dataset_list_state(request)[0]
+
+
+def dataset_list_last_modified(request):
+    return _dataset_list_state(request)[1]
+
+
+def async_condition(etag_func=None, last_modified_func=None):
+    """
+    condition() for async views. The ETag/Last-Modified functions query
+    the database, so Django's check runs in a worker thread; the view only
+    runs when it does not answer 304/412 itself.
+    """
+    def decorator(view):
+        @condition(etag_func=etag_func, last_modified_func=last_modified_func)
+        def check(request, *args, **kwargs):
+            # Stands in for the view; condition() puts the validators on it
+            return HttpResponse()
+        
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            checked = await sync_to_async(check)(request, *args, **kwargs)
+            if checked.status_code != 200:
+                return checked
+            response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and response.status_code == 200:
+                for header in ('ETag', 'Last-Modified'):
+                    if header in checked and header not in response:
+                        response[header] = checked[header]
+            return response
+        return inner
+    return decorator
@@ -0,0 +1,114 @@
+from .models import Equipment
+from .renderers import ArrowStreamRenderer, NpzRenderer, ParquetRenderer
+import io
+import itertools
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+
+EXPORT_COLUMNS = ['equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
+STRING_COLUMNS = ['equipment_name', 'equipment_type']
+
+# Rows fetched from the database and written per record batch / row group
+BATCH_SIZE = 65536
+
+
+def get_export_renderers():
+    """Renderers for the export formats available in this install"""
+    renderers = [NpzRenderer]
+    if pa is not None:
+        # Arrow first: it is the default for clients that accept anything
+        renderers = [ArrowStreamRenderer, ParquetRenderer] + renderers
+    return renderers
+
+
+def iter_column_batches(dataset_id, batch_size=BATCH_SIZE):
+    """Yield the dataset's equipment as lists of column values, batch_size rows at a time"""
+    rows = (
+        Equipment.objects
+        .filter(dataset_id=dataset_id)
+        .order_by('id')
+        .values_list(*EXPORT_COLUMNS)
+        .iterator(chunk_size=batch_size)
+    )
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield [list(col) for col in zip(*batch)]
+
+
+def _arrow_schema():
+    return pa.schema([
+        (col, pa.string() if col in STRING_COLUMNS else pa.float64())
+        for col in EXPORT_COLUMNS
+    ])
+
+
+def _arrow_batches(dataset_id, schema):
+    for columns in iter_column_batches(dataset_id):
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        )
+
+
+def _drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def stream_arrow(dataset_id):
+    """Yield the dataset as an Arrow IPC stream, one record batch at a time"""
+    schema = _arrow_schema()
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in _arrow_batches(dataset_id, schema):
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def stream_parquet(dataset_id):
+    """Yield the dataset as a Parquet file, one row group per batch"""
+    schema = _arrow_schema()
+    sink = io.BytesIO()
+    with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for batch in _arrow_batches(dataset_id, schema):
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def stream_npz(dataset_id):
+    """
+    Yield the dataset as a NumPy .npz archive with one array per column.
+    NumPy has no streaming writer, so the archive is built in memory.
+    """
+    columns = {col: [] for col in EXPORT_COLUMNS}
+    for batch in iter_column_batches(dataset_id):
+        for col, values in zip(EXPORT_COLUMNS, batch):
+            columns[col].extend(values)
+
+    arrays = {
+        col: np.array(values, dtype=str if col in STRING_COLUMNS else np.float64)
+        for col, values in columns.items()
+    }
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    yield buffer.getvalue()
+
+
+EXPORT_WRITERS = {
+    'arrow': (stream_arrow, 'arrow'),
+    'parquet': (stream_parquet, 'parquet'),
+    'npz': (stream_npz, 'npz'),
+}
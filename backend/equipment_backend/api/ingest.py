@@ -0,0 +1,520 @@
+from collections import Counter
+from django.conf import settings
+from django.db import connection, transaction
+from .metrics import ROWS_INGESTED
+from .models import Dataset, Equipment, TypeSummary
+from .profiling import span
+import numpy as np
+import pandas as pd
+import hashlib
+import logging
+import math
+import pickle
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+DEFAULT_CHUNK_SIZE = 50000
+DEFAULT_INSERT_MODE = 'columnar'
+# Rows kept per equipment type to estimate percentiles; exact below this size
+DEFAULT_SAMPLE_SIZE = 10000
+
+# Model field prefix of each numeric CSV column
+PARAMETER_FIELDS = {'Flowrate': 'flowrate', 'Pressure': 'pressure', 'Temperature': 'temperature'}
+
+
+class IngestError(ValueError):
+    """Raised when an uploaded CSV cannot be ingested"""
+
+
+class ColumnStats:
+    """Running count, mean, sum of squared deviations, min and max of one column"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        """Fold an array of values into the running statistics"""
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        self.merge(len(values), mean, m2, float(values.min()), float(values.max()))
+
+    def merge(self, count, mean, m2, minimum, maximum):
+        """Combine with statistics of another batch (Chan et al. parallel variance)"""
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    @property
+    def std(self):
+        """Sample standard deviation, like pandas' Series.std()"""
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self.m2 / (self.count - 1))
+
+
+class TypeStats:
+    """
+    Statistics of one equipment type. Percentiles come from a uniform
+    random sample of rows (bottom-k of random keys), which is exact
+    while the type has no more rows than the sample size.
+    """
+
+    def __init__(self, sample_size, rng):
+        self.count = 0
+        self.columns = {col: ColumnStats() for col in NUMERIC_COLUMNS}
+        self.sample_size = sample_size
+        self.rng = rng
+        self.sample = np.empty((0, len(NUMERIC_COLUMNS)))
+        self.keys = np.empty(0)
+        # Stored statistics this type starts from when appending rows
+        self.prior_count = 0
+        self.prior_quantiles = {}
+
+    @classmethod
+    def from_summary(cls, summary, sample_size, rng):
+        """Start from a saved TypeSummary without reading its rows"""
+        stats = cls(sample_size, rng)
+        stats.count = stats.prior_count = summary.count
+        for col in NUMERIC_COLUMNS:
+            prefix = PARAMETER_FIELDS[col]
+            std = getattr(summary, f'{prefix}_std')
+            column = stats.columns[col]
+            column.count = summary.count
+            column.mean = getattr(summary, f'{prefix}_mean')
+            column.m2 = std * std * (summary.count - 1)
+            column.min = getattr(summary, f'{prefix}_min')
+            column.max = getattr(summary, f'{prefix}_max')
+            stats.prior_quantiles[col] = [
+                getattr(summary, f'{prefix}_{stat}')
+                for stat in ('min', 'p25', 'p50', 'p75', 'max')
+            ]
+        return stats
+
+    def update(self, group):
+        self.count += len(group)
+        for col in NUMERIC_COLUMNS:
+            self.columns[col].update(group[col].to_numpy())
+
+        # Keep the rows with the smallest random keys seen so far
+        sample = np.vstack([self.sample, group[NUMERIC_COLUMNS].to_numpy()])
+        keys = np.concatenate([self.keys, self.rng.random(len(group))])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+            sample, keys = sample[keep], keys[keep]
+        self.sample, self.keys = sample, keys
+
+    def summary_fields(self):
+        """Return TypeSummary field values"""
+        fields = {'count': self.count}
+        for idx, col in enumerate(NUMERIC_COLUMNS):
+            stats = self.columns[col]
+            values = self.sample[:, idx]
+            values = values[~np.isnan(values)]
+            p25, p50, p75 = self._percentiles(col, values)
+            prefix = PARAMETER_FIELDS[col]
+            fields.update({
+                f'{prefix}_min': stats.min,
+                f'{prefix}_max': stats.max,
+                f'{prefix}_mean': stats.mean,
+                f'{prefix}_std': stats.std,
+                f'{prefix}_p25': float(p25),
+                f'{prefix}_p50': float(p50),
+                f'{prefix}_p75': float(p75),
+            })
+        return fields
+
+    def _percentiles(self, col, values):
+        """
+        Quartiles of the column. After an append the stored quartiles are
+        treated as a piecewise-linear CDF and mixed, weighted by row count,
+        with the empirical CDF of the new rows' sample.
+        """
+        if not self.prior_count:
+            if not len(values):
+                return (math.nan,) * 3
+            return np.percentile(values, [25, 50, 75])
+
+        knots = self.prior_quantiles[col]
+        if not len(values):
+            return knots[1:4]
+
+        new_count = self.count - self.prior_count
+        grid = np.unique(np.concatenate([knots, values]))
+        prior_cdf = np.interp(grid, knots, [0.0, 0.25, 0.5, 0.75, 1.0])
+        new_cdf = np.searchsorted(np.sort(values), grid, side='right') / len(values)
+        cdf = (self.prior_count * prior_cdf + new_count * new_cdf) / self.count
+        return np.interp([0.25, 0.5, 0.75], cdf, grid)
+
+
+class RunningStats:
+    """
+    Accumulate dataset statistics one chunk at a time so the whole
+    file never has to be held in memory
+    """
+
+    def __init__(self, sample_size=None):
+        self.count = 0
+        self.sums = {col: 0.0 for col in NUMERIC_COLUMNS}
+        self.non_null = {col: 0 for col in NUMERIC_COLUMNS}
+        self.type_counts = Counter()
+        self.types = {}
+        self.sample_size = sample_size or getattr(
+            settings, 'TYPE_STATS_SAMPLE_SIZE', DEFAULT_SAMPLE_SIZE
+        )
+        # Seeded so re-ingesting the same file gives the same percentiles
+        self.rng = np.random.default_rng(0)
+
+    def update(self, chunk):
+        """Fold a DataFrame chunk into the running totals"""
+        self.count += len(chunk)
+        for col in NUMERIC_COLUMNS:
+            values = chunk[col]
+            self.sums[col] += float(values.sum())
+            self.non_null[col] += int(values.count())
+        self.type_counts.update(chunk['Type'].value_counts().to_dict())
+        for eq_type, group in chunk.groupby('Type', sort=False):
+            if eq_type not in self.types:
+                self.types[eq_type] = TypeStats(self.sample_size, self.rng)
+            self.types[eq_type].update(group)
+
+    def mean(self, col):
+        if not self.non_null[col]:
+            return float('nan')
+        return self.sums[col] / self.non_null[col]
+
+    def as_dict(self):
+        """Return statistics in the same shape the upload view always produced"""
+        return {
+            'total_count': self.count,
+            'avg_flowrate': self.mean('Flowrate'),
+            'avg_pressure': self.mean('Pressure'),
+            'avg_temperature': self.mean('Temperature'),
+            'type_distribution': dict(self.type_counts.most_common()),
+        }
+
+    def seed_types(self, summaries):
+        """Continue the per-type statistics from saved TypeSummary rows"""
+        for summary in summaries:
+            self.types[summary.equipment_type] = TypeStats.from_summary(
+                summary, self.sample_size, self.rng
+            )
+
+    def type_summaries(self, dataset):
+        """Build unsaved TypeSummary rows for the dataset"""
+        return [
+            TypeSummary(dataset=dataset, equipment_type=eq_type, **stats.summary_fields())
+            for eq_type, stats in self.types.items()
+        ]
+
+
+def read_csv_chunks(csv_file, chunk_size=None):
+    """
+    Yield validated DataFrame chunks of at most chunk_size rows.
+    Only the required columns are parsed.
+    """
+    chunk_size = chunk_size or getattr(settings, 'CSV_INGEST_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+    reader = pd.read_csv(
+        csv_file,
+        usecols=lambda col: col in REQUIRED_COLUMNS,
+        chunksize=chunk_size,
+    )
+    with reader:
+        for chunk in reader:
+            if not all(col in chunk.columns for col in REQUIRED_COLUMNS):
+                raise IngestError(f'CSV must contain columns: {", ".join(REQUIRED_COLUMNS)}')
+            for col in NUMERIC_COLUMNS:
+                chunk[col] = chunk[col].astype(float)
+            yield chunk
+
+
+def insert_chunk_orm(dataset, chunk):
+    """Insert one chunk by building an Equipment instance per row"""
+    equipment_list = []
+    for _, row in chunk.iterrows():
+        equipment = Equipment(
+            dataset=dataset,
+            equipment_name=row['Equipment Name'],
+            equipment_type=row['Type'],
+            flowrate=float(row['Flowrate']),
+            pressure=float(row['Pressure']),
+            temperature=float(row['Temperature'])
+        )
+        equipment_list.append(equipment)
+
+    Equipment.objects.bulk_create(equipment_list)
+    return len(equipment_list)
+
+
+def _equipment_insert_sql():
+    """Build the parameterised INSERT statement for the equipment table"""
+    opts = Equipment._meta
+    quote = connection.ops.quote_name
+    columns = [
+        opts.get_field(name).column
+        for name in ('dataset', 'equipment_name', 'equipment_type',
+                     'flowrate', 'pressure', 'temperature')
+    ]
+    placeholders = ', '.join(['%s'] * len(columns))
+    return (
+        f'INSERT INTO {quote(opts.db_table)} '
+        f'({", ".join(quote(col) for col in columns)}) VALUES ({placeholders})'
+    )
+
+
+def _text_values(column):
+    """
+    Column values as the strings CharField.to_python would store, so blank
+    cells become 'nan' like in the orm mode instead of NULL
+    """
+    return [value if isinstance(value, str) else str(value) for value in column.tolist()]
+
+
+def insert_chunk_columnar(dataset, chunk):
+    """
+    Insert one chunk straight from its NumPy columns.
+    Rows are zipped into parameter tuples and sent with a single
+    executemany, without creating a Series or model instance per row.
+    """
+    count = len(chunk)
+    params = zip(
+        [dataset.pk] * count,
+        _text_values(chunk['Equipment Name']),
+        _text_values(chunk['Type']),
+        chunk['Flowrate'].to_numpy().tolist(),
+        chunk['Pressure'].to_numpy().tolist(),
+        chunk['Temperature'].to_numpy().tolist(),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(_equipment_insert_sql(), list(params))
+    return count
+
+
+INSERT_MODES = {
+    'orm': insert_chunk_orm,
+    'columnar': insert_chunk_columnar,
+}
+
+
+def get_insert_function():
+    """Return the chunk insert function selected by CSV_INGEST_INSERT_MODE"""
+    mode = getattr(settings, 'CSV_INGEST_INSERT_MODE', DEFAULT_INSERT_MODE)
+    if mode not in INSERT_MODES:
+        raise ValueError(f'Unknown CSV_INGEST_INSERT_MODE: {mode}')
+    return mode, INSERT_MODES[mode]
+
+
+def get_content_hash(uploaded_file):
+    """
+    Return the SHA-256 of an uploaded file. Uses the digest computed by
+    the hashing upload handlers when present, otherwise reads the file once.
+    """
+    digest = getattr(uploaded_file, 'content_hash', None)
+    if digest:
+        return digest
+
+    hasher = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    return hasher.hexdigest()
+
+
+def find_duplicate(user, content_hash):
+    """Return the user's dataset that was ingested from identical content, if any"""
+    return Dataset.objects.filter(user=user, content_hash=content_hash).first()
+
+
+def _stream_rows(csv_file, dataset, stats, insert_chunk, chunk_size=None, progress=None):
+    """Parse, fold into stats and insert the CSV one chunk at a time"""
+    inserted = 0
+    chunks = read_csv_chunks(csv_file, chunk_size)
+    while True:
+        with span('parse'):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        with span('stats'):
+            stats.update(chunk)
+        if progress:
+            progress(stats.count, inserted)
+        with span('insert'):
+            inserted += insert_chunk(dataset, chunk)
+        if progress:
+            progress(stats.count, inserted)
+
+    if stats.count == 0:
+        raise IngestError('CSV file contains no rows')
+
+
+def _create_dataset(user, filename, content_hash):
+    # Statistics are filled in once the last chunk has been read
+    return Dataset.objects.create(
+        user=user,
+        filename=filename,
+        total_count=0,
+        avg_flowrate=0.0,
+        avg_pressure=0.0,
+        avg_temperature=0.0,
+        type_distribution='{}',
+        content_hash=content_hash
+    )
+
+
+def _complete_dataset(dataset, stats):
+    result = stats.as_dict()
+    dataset.total_count = result['total_count']
+    dataset.avg_flowrate = result['avg_flowrate']
+    dataset.avg_pressure = result['avg_pressure']
+    dataset.avg_temperature = result['avg_temperature']
+    dataset.set_type_distribution(result['type_distribution'])
+    dataset.save()
+    TypeSummary.objects.bulk_create(stats.type_summaries(dataset))
+
+
+def _log_ingest(dataset, stats, started, mode):
+    ROWS_INGESTED.inc(stats.count)
+    elapsed = time.perf_counter() - started
+    logger.info(
+        'Ingested %d rows into dataset %s in %.2fs (%.0f rows/s, %s insert)',
+        stats.count, dataset.pk, elapsed, stats.count / elapsed if elapsed else 0, mode
+    )
+
+
+def ingest_csv(csv_file, user, filename, chunk_size=None, progress=None, content_hash=''):
+    """
+    Stream a CSV upload into a new Dataset.
+
+    The file is read in fixed-size chunks; each chunk is folded into the
+    running statistics and flushed to the database before the next one is
+    parsed, so peak memory depends on the chunk size rather than the file size.
+    If given, progress(rows_parsed, rows_inserted) is called as chunks go by.
+    """
+    stats = RunningStats()
+    mode, insert_chunk = get_insert_function()
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        dataset = _create_dataset(user, filename, content_hash)
+        _stream_rows(csv_file, dataset, stats, insert_chunk, chunk_size, progress)
+        _complete_dataset(dataset, stats)
+
+    _log_ingest(dataset, stats, started, mode)
+    return dataset
+
+
+def spool_chunks(csv_file, spool_path, chunk_size=None):
+    """
+    Parse a whole CSV into RunningStats without touching the database,
+    pickling each validated chunk to spool_path as it goes. Used to parse
+    batch uploads in worker processes: only the statistics come back, and
+    ingest_spooled() inserts the chunks without parsing the CSV again.
+    """
+    stats = RunningStats()
+    with open(spool_path, 'wb') as spool:
+        for chunk in read_csv_chunks(csv_file, chunk_size):
+            stats.update(chunk)
+            pickle.dump(chunk, spool, protocol=pickle.HIGHEST_PROTOCOL)
+    if stats.count == 0:
+        raise IngestError('CSV file contains no rows')
+    return stats
+
+
+def read_spooled_chunks(spool_path):
+    """
+    Yield the chunks spool_chunks() wrote. Only ever given files this
+    server wrote into its own spool directory, so unpickling them is safe.
+    """
+    with open(spool_path, 'rb') as spool:
+        while True:
+            try:
+                yield pickle.load(spool)
+            except EOFError:
+                return
+
+
+def ingest_spooled(spool_path, stats, user, filename, content_hash=''):
+    """
+    Insert chunks spooled by spool_chunks() into a new Dataset whose
+    statistics it already computed
+    """
+    mode, insert_chunk = get_insert_function()
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        dataset = _create_dataset(user, filename, content_hash)
+        with span('insert'):
+            for chunk in read_spooled_chunks(spool_path):
+                insert_chunk(dataset, chunk)
+        _complete_dataset(dataset, stats)
+
+    _log_ingest(dataset, stats, started, mode)
+    return dataset
+
+
+def append_csv(csv_file, dataset, chunk_size=None, progress=None):
+    """
+    Stream a CSV into an existing Dataset.
+
+    Only the new rows are parsed: the stored means, type distribution and
+    per-type summaries are merged with the new rows' running statistics,
+    so the rows already in the dataset are never read back.
+    """
+    stats = RunningStats()
+    mode, insert_chunk = get_insert_function()
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        dataset = Dataset.objects.select_for_update().get(pk=dataset.pk)
+        stats.seed_types(TypeSummary.objects.filter(dataset=dataset))
+
+        _stream_rows(csv_file, dataset, stats, insert_chunk, chunk_size, progress)
+
+        # Merge means weighted by row count
+        old_count = dataset.total_count
+        for field, col in (('avg_flowrate', 'Flowrate'),
+                           ('avg_pressure', 'Pressure'),
+                           ('avg_temperature', 'Temperature')):
+            total = old_count + stats.non_null[col]
+            merged = (old_count * getattr(dataset, field) + stats.sums[col]) / total
+            setattr(dataset, field, merged)
+        dataset.total_count = old_count + stats.count
+
+        type_counts = Counter(dataset.get_type_distribution())
+        type_counts.update(stats.type_counts)
+        dataset.set_type_distribution(dict(type_counts.most_common()))
+
+        # The dataset no longer matches the file it was uploaded from
+        dataset.content_hash = ''
+        dataset.version += 1
+        dataset.save()
+
+        TypeSummary.objects.filter(dataset=dataset).delete()
+        TypeSummary.objects.bulk_create(stats.type_summaries(dataset))
+
+    ROWS_INGESTED.inc(stats.count)
+    elapsed = time.perf_counter() - started
+    logger.info(
+        'Appended %d rows to dataset %s in %.2fs (%.0f rows/s, %s insert)',
+        stats.count, dataset.pk, elapsed, stats.count / elapsed if elapsed else 0, mode
+    )
+    return dataset
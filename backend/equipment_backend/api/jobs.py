@@ -0,0 +1,256 @@
+from collections import OrderedDict, deque
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from .metrics import INGEST_QUEUE_DEPTH
+from .models import IngestJob
+from .ingest import IngestError, find_duplicate, ingest_csv
+from .retention import enforce_retention
+import logging
+import os
+import socket
+import threading
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+# Seconds without a progress report after which a running job whose
+# process cannot be checked is taken to be abandoned
+DEFAULT_HEARTBEAT_TIMEOUT = 60
+
+
+class FairJobQueue:
+    """
+    In-process job queue served by a small pool of worker threads.
+
+    Pending jobs are kept in one FIFO per user and workers take from the
+    users in round-robin order, so a user with many queued uploads cannot
+    starve everyone else.
+    """
+
+    def __init__(self, handler, workers):
+        self.handler = handler
+        self.workers = workers
+        self._pending = OrderedDict()  # user id -> deque of job ids
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def submit(self, user_id, job_id):
+        with self._cond:
+            self._pending.setdefault(user_id, deque()).append(job_id)
+            INGEST_QUEUE_DEPTH.inc()
+            self._start_workers()
+            self._cond.notify()
+
+    def queued_count(self):
+        with self._cond:
+            return sum(len(jobs) for jobs in self._pending.values())
+
+    def _start_workers(self):
+        # Called with the lock held; workers are started on first use
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._work,
+                name=f'ingest-worker-{len(self._threads)}',
+                daemon=True,
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def _take(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            user_id, jobs = self._pending.popitem(last=False)
+            job_id = jobs.popleft()
+            INGEST_QUEUE_DEPTH.dec()
+            if jobs:
+                # Send the user to the back of the line
+                self._pending[user_id] = jobs
+            return job_id
+
+    def _work(self):
+        while True:
+            job_id = self._take()
+            try:
+                self.handler(job_id)
+            except Exception:
+                logger.exception('Ingest job %s crashed', job_id)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the process-wide ingest queue, recovering abandoned jobs on first use"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            workers = getattr(settings, 'INGEST_WORKERS', DEFAULT_WORKERS)
+            _queue = FairJobQueue(run_ingest_job, workers)
+            recover_jobs(_queue)
+        return _queue
+
+
+def get_heartbeat_timeout():
+    return getattr(settings, 'INGEST_HEARTBEAT_TIMEOUT', DEFAULT_HEARTBEAT_TIMEOUT)
+
+
+def process_owner():
+    """Identify this server process in IngestJob.owner"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _owner_alive(owner):
+    """
+    Whether the process that claimed a job is still running. Only
+    processes on this host can be checked; returns None for the others.
+    """
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit() or os.name != 'posix':
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _progress_key(job_id):
+    return f'ingest-job-progress:{job_id}'
+
+
+def report_progress(job_id, rows_parsed, rows_inserted):
+    """
+    Publish a running job's row counts. They go through Django's cache
+    because the ingest transaction holds SQLite's write lock, so the job
+    row cannot be updated until it commits; the entry doubles as the
+    job's heartbeat and expires after INGEST_HEARTBEAT_TIMEOUT.
+    """
+    shared_cache.set(_progress_key(job_id), (rows_parsed, rows_inserted), get_heartbeat_timeout())
+
+
+def get_live_progress(job_id):
+    """Return (rows_parsed, rows_inserted) of a running job, or None without a recent report"""
+    return shared_cache.get(_progress_key(job_id))
+
+
+def is_abandoned(job):
+    """
+    Whether a running job's process has gone away: its owner process is
+    no longer running on this host, or, for owners on other hosts, it has
+    not reported progress within INGEST_HEARTBEAT_TIMEOUT
+    """
+    alive = _owner_alive(job.owner)
+    if alive is not None:
+        return not alive
+    cutoff = timezone.now() - timedelta(seconds=get_heartbeat_timeout())
+    return job.updated_at < cutoff and get_live_progress(job.pk) is None
+
+
+def recover_jobs(queue):
+    """
+    Pick up jobs that stopped server processes left behind. Queued jobs
+    are submitted again; whichever process claims one first runs it.
+    Running jobs of processes that are gone cannot be resumed, so they
+    are marked failed and their spooled files deleted. Jobs still being
+    run by other live processes are left alone.
+    """
+    for job in IngestJob.objects.filter(status=IngestJob.STATUS_RUNNING):
+        if not is_abandoned(job):
+            continue
+        # Only one of several recovering processes fails the job
+        failed = IngestJob.objects.filter(
+            pk=job.pk, status=IngestJob.STATUS_RUNNING, owner=job.owner
+        ).update(
+            status=IngestJob.STATUS_FAILED,
+            error='Ingest was interrupted by a server restart; please upload the file again',
+            updated_at=timezone.now(),
+        )
+        if not failed:
+            continue
+        if os.path.exists(job.upload_path):
+            os.remove(job.upload_path)
+        logger.warning('Marked ingest job %s of stopped process %s as failed', job.pk, job.owner)
+
+    queued = IngestJob.objects.filter(status=IngestJob.STATUS_QUEUED).order_by('created_at')
+    for job_id, user_id in queued.values_list('id', 'user_id'):
+        queue.submit(user_id, job_id)
+
+
+def enqueue_upload(uploaded_file, user, content_hash=''):
+    """
+    Spool an uploaded CSV to disk and queue it for background ingestion.
+    Returns the new IngestJob.
+    """
+    uploads_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
+    os.makedirs(uploads_dir, exist_ok=True)
+    upload_path = os.path.join(uploads_dir, f'{uuid.uuid4().hex}.csv')
+
+    with open(upload_path, 'wb') as out:
+        for chunk in uploaded_file.chunks():
+            out.write(chunk)
+
+    job = IngestJob.objects.create(
+        user=user,
+        filename=uploaded_file.name,
+        upload_path=upload_path,
+        content_hash=content_hash
+    )
+    transaction.on_commit(lambda: get_queue().submit(user.pk, job.pk))
+    return job
+
+
+def run_ingest_job(job_id):
+    """Ingest a queued upload; runs on a worker thread"""
+    close_old_connections()
+    # Claim the job; it may already have been taken by another process
+    # that recovered it after a restart
+    claimed = IngestJob.objects.filter(pk=job_id, status=IngestJob.STATUS_QUEUED).update(
+        status=IngestJob.STATUS_RUNNING, owner=process_owner(), updated_at=timezone.now()
+    )
+    if not claimed:
+        return
+    job = IngestJob.objects.select_related('user').get(pk=job_id)
+    report_progress(job_id, 0, 0)
+
+    def progress(rows_parsed, rows_inserted):
+        report_progress(job_id, rows_parsed, rows_inserted)
+
+    try:
+        # An identical upload may have finished while this one was queued
+        dataset = job.content_hash and find_duplicate(job.user, job.content_hash)
+        if not dataset:
+            with open(job.upload_path, 'rb') as csv_file:
+                dataset = ingest_csv(
+                    csv_file, job.user, job.filename,
+                    progress=progress, content_hash=job.content_hash
+                )
+
+            # Drop datasets that fall outside the retention policy
+            enforce_retention(job.user)
+
+        job.status = IngestJob.STATUS_COMPLETED
+        job.dataset = dataset
+        job.rows_parsed = dataset.total_count
+        job.rows_inserted = dataset.total_count
+    except Exception as e:
+        job.status = IngestJob.STATUS_FAILED
+        job.error = str(e) if isinstance(e, IngestError) else f'Error processing CSV: {str(e)}'
+        # Inserted rows were rolled back with the failed transaction
+        job.rows_parsed = (get_live_progress(job_id) or (0, 0))[0]
+        job.rows_inserted = 0
+    finally:
+        shared_cache.delete(_progress_key(job_id))
+        if os.path.exists(job.upload_path):
+            os.remove(job.upload_path)
+
+    job.save()
+    connection.close()
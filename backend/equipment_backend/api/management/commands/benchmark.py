@@ -0,0 +1,182 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from api import report_cache
+from api.models import Dataset
+from api.synthetic import write_synthetic_csv
+import django
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+
+DEFAULT_ROWS = [1000, 100000, 1000000, 5000000]
+
+# Metrics compared against a baseline; for all of them lower is better
+# except rows/sec
+COMPARED_METRICS = [
+    'upload_rows_per_sec',
+    'upload_peak_memory_bytes',
+    'detail_median_seconds',
+    'report_median_seconds',
+]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'End-to-end benchmark: upload_csv rows/sec and peak memory, '
+        'dataset_detail latency and generate_report wall time on synthetic datasets'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+            help='Dataset sizes to benchmark',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Times dataset_detail and generate_report are requested per size',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+        parser.add_argument(
+            '--output', default='benchmark_results.json',
+            help='File the results are written to as JSON',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Results file of an earlier run to compare against',
+        )
+
+    def handle(self, *args, **options):
+        # Lets the test client use the 'testserver' host whatever ALLOWED_HOSTS says
+        setup_test_environment()
+        user = User.objects.create_user(f'benchmark-{time.time_ns()}')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+        results = []
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                for rows in options['rows']:
+                    results.append(self.run_size(client, rows, options, tmp_dir))
+        finally:
+            user.delete()
+            teardown_test_environment()
+
+        report = {
+            'commit': git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'seed': options['seed'],
+            'results': results,
+        }
+        with open(options['output'], 'w') as out:
+            json.dump(report, out, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options['baseline']:
+            self.compare(options['baseline'], results)
+
+    def run_size(self, client, rows, options, tmp_dir):
+        csv_path = os.path.join(tmp_dir, f'equipment_{rows}.csv')
+        with open(csv_path, 'w', newline='') as out:
+            write_synthetic_csv(out, rows, options['seed'])
+        self.stdout.write(f'{rows} rows')
+
+        # Upload peak memory, in its own run since tracemalloc slows the
+        # upload down several times over; the dataset is then deleted so
+        # the timed upload is not answered as a duplicate
+        tracemalloc.start()
+        dataset_id = self.upload(client, csv_path, rows)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        Dataset.objects.filter(pk=dataset_id).delete()
+
+        # Upload throughput
+        start = time.perf_counter()
+        dataset_id = self.upload(client, csv_path, rows)
+        upload_time = time.perf_counter() - start
+
+        result = {
+            'rows': rows,
+            'csv_bytes': os.path.getsize(csv_path),
+            'upload_seconds': round(upload_time, 4),
+            'upload_rows_per_sec': round(rows / upload_time, 1),
+            'upload_peak_memory_bytes': peak_memory,
+        }
+        os.remove(csv_path)
+        self.stdout.write(
+            f"  upload   {upload_time:.3f}s  {result['upload_rows_per_sec']:,.0f} rows/s  "
+            f'peak {peak_memory / 2 ** 20:.1f} MiB'
+        )
+
+        # Dataset detail
+        detail_times = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            response = client.get(reverse('dataset_detail', args=[dataset_id]))
+            detail_times.append(time.perf_counter() - start)
+        result['detail_bytes'] = len(response.content)
+        result['detail_seconds'] = [round(t, 4) for t in detail_times]
+        result['detail_median_seconds'] = round(statistics.median(detail_times), 4)
+        self.stdout.write(f"  detail   {result['detail_median_seconds']:.3f}s median")
+
+        # Report, rendered from scratch every time
+        report_times = []
+        for _ in range(options['repeat']):
+            report_cache.invalidate(dataset_id)
+            start = time.perf_counter()
+            response = client.get(reverse('generate_report', args=[dataset_id]))
+            b''.join(response.streaming_content)
+            report_times.append(time.perf_counter() - start)
+        result['report_seconds'] = [round(t, 4) for t in report_times]
+        result['report_median_seconds'] = round(statistics.median(report_times), 4)
+        self.stdout.write(f"  report   {result['report_median_seconds']:.3f}s median")
+
+        return result
+
+    def upload(self, client, csv_path, rows):
+        with open(csv_path, 'rb') as csv_file:
+            response = client.post(reverse('upload_csv'), {'file': csv_file}, format='multipart')
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f'Upload of {rows} rows failed: {response.status_code} {response.content[:200]}')
+        return response.json()['id']
+
+    def compare(self, baseline_path, results):
+        with open(baseline_path) as f:
+            baseline = {r['rows']: r for r in json.load(f)['results']}
+
+        self.stdout.write(f'Compared with {baseline_path}:')
+        for result in results:
+            previous = baseline.get(result['rows'])
+            if previous is None:
+                continue
+            for metric in COMPARED_METRICS:
+                if not previous.get(metric):
+                    continue
+                change = (result[metric] - previous[metric]) / previous[metric] * 100
+                self.stdout.write(
+                    f"  {result['rows']:>9} rows  {metric:<26} "
+                    f'{previous[metric]:>14,} -> {result[metric]:>14,}  ({change:+.1f}%)'
+                )
@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.ingest import ingest_csv
+from api.synthetic import synthetic_csv
+from api.utils import DETAIL_LEVELS, generate_pdf_report
+import json
+import re
+import time
+import tracemalloc
+
+
+def page_count(pdf):
+    return len(re.findall(rb'/Type\s*/Page\b', pdf))
+
+
+class Command(BaseCommand):
+    help = 'Measure PDF report render time, peak memory and page count in summary and full detail'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[10000, 100000],
+            help='Dataset sizes to measure',
+        )
+        parser.add_argument(
+            '--detail', nargs='+', choices=DETAIL_LEVELS, default=DETAIL_LEVELS,
+            help='Report detail levels to render',
+        )
+        parser.add_argument(
+            '--json', dest='json_path',
+            help='Also write the results to this file as JSON',
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        for rows in options['rows']:
+            # Everything created for the run is rolled back afterwards
+            with transaction.atomic():
+                user = User.objects.create_user(f'benchmark-{time.time_ns()}')
+                dataset = ingest_csv(synthetic_csv(rows), user, f'benchmark_{rows}.csv')
+                for detail in options['detail']:
+                    results.append(self.measure(dataset, rows, detail))
+                transaction.set_rollback(True)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as out:
+                json.dump(results, out, indent=2)
+
+    def measure(self, dataset, rows, detail):
+        # Rendered in this process so tracemalloc sees the whole render
+        tracemalloc.start()
+        start = time.perf_counter()
+        pdf = generate_pdf_report(dataset, detail=detail)
+        render_time = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        result = {
+            'rows': rows,
+            'detail': detail,
+            'render_seconds': round(render_time, 4),
+            'rows_per_sec': round(rows / render_time, 1),
+            'peak_memory_bytes': peak_memory,
+            'pages': page_count(pdf),
+            'pdf_bytes': len(pdf),
+        }
+        self.stdout.write(
+            f"{rows} rows, {detail}: {render_time:.3f}s  peak {peak_memory / 2 ** 20:.1f} MiB  "
+            f"{result['pages']} pages  {len(pdf):,} bytes"
+        )
+        return result
@@ -0,0 +1,70 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from api.ingest import ingest_csv
+from api.middleware import brotli
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import DatasetSerializer
+from api.synthetic import synthetic_csv
+import gzip
+import json
+import time
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Measure serialization time and bytes on the wire of the dataset_detail response'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[10000, 100000, 1000000],
+            help='Dataset sizes to measure',
+        )
+        parser.add_argument(
+            '--json', dest='json_path',
+            help='Also write the results to this file as JSON',
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        for rows in options['rows']:
+            # Everything created for the run is rolled back afterwards
+            with transaction.atomic():
+                user = User.objects.create_user(f'benchmark-{time.time_ns()}')
+                dataset = ingest_csv(synthetic_csv(rows), user, f'benchmark_{rows}.csv')
+                results.append(self.measure(dataset, rows))
+                transaction.set_rollback(True)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as out:
+                json.dump(results, out, indent=2)
+
+    def measure(self, dataset, rows):
+        data, serialize_time = timed(lambda: DatasetSerializer(dataset).data)
+        result = {'rows': rows, 'serialize_seconds': round(serialize_time, 4)}
+        self.stdout.write(f'{rows} rows: serializer {serialize_time:.3f}s')
+
+        renderers = [('json', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('orjson', FastJSONRenderer()))
+        for name, renderer in renderers:
+            body, render_time = timed(renderer.render, data)
+            result[f'{name}_render_seconds'] = round(render_time, 4)
+            self.stdout.write(f'  {name:<7} render {render_time:.3f}s')
+
+        encodings = [('identity', lambda b: b), ('gzip', lambda b: gzip.compress(b, compresslevel=6, mtime=0))]
+        if brotli is not None:
+            encodings.append(('br', lambda b: brotli.compress(b, quality=5)))
+        for name, compress in encodings:
+            wire, compress_time = timed(compress, body)
+            result[f'{name}_bytes'] = len(wire)
+            result[f'{name}_compress_seconds'] = round(compress_time, 4)
+            self.stdout.write(f'  {name:<8} {len(wire):>12,} bytes  {compress_time:.3f}s')
+
+        return result
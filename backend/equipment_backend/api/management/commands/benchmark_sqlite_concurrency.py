@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from api.ingest import ingest_csv
+from api.retention import retained_datasets
+from api.serializers import DatasetListSerializer
+from api.synthetic import synthetic_csv
+import json
+import numpy as np
+import threading
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure read latency while a large upload is being ingested. '
+        'Run it with and without SQLITE_PRODUCTION_PROFILE=1 to compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=1000000,
+            help='Rows in the upload ingested during the measurement',
+        )
+        parser.add_argument(
+            '--json', dest='json_path',
+            help='Also write the results to this file as JSON',
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(f'benchmark-{time.time_ns()}')
+        try:
+            result = self.measure(user, options['rows'])
+        finally:
+            # Cascades to the benchmark datasets
+            user.delete()
+
+        for key, value in result.items():
+            self.stdout.write(f'{key}: {value}')
+        if options['json_path']:
+            with open(options['json_path'], 'w') as out:
+                json.dump(result, out, indent=2)
+
+    def measure(self, user, rows):
+        ingest_csv(synthetic_csv(100), user, 'benchmark_small.csv')
+        upload = synthetic_csv(rows)
+        ingest_time = {}
+
+        def ingest():
+            try:
+                start = time.perf_counter()
+                ingest_csv(upload, user, 'benchmark_large.csv')
+                ingest_time['seconds'] = time.perf_counter() - start
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=ingest)
+        writer.start()
+
+        # Read the dataset list, as a polling dashboard would, until the
+        # upload is committed
+        latencies = []
+        errors = 0
+        while writer.is_alive():
+            start = time.perf_counter()
+            try:
+                DatasetListSerializer(retained_datasets(user), many=True).data
+            except OperationalError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        writer.join()
+
+        latencies_ms = np.array(latencies) * 1000
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+
+        return {
+            'journal_mode': journal_mode,
+            'rows': rows,
+            'ingest_seconds': round(ingest_time.get('seconds', float('nan')), 3),
+            'reads': len(latencies),
+            'read_errors': errors,
+            'read_p50_ms': round(float(np.percentile(latencies_ms, 50)), 3) if latencies else None,
+            'read_p95_ms': round(float(np.percentile(latencies_ms, 95)), 3) if latencies else None,
+            'read_max_ms': round(float(latencies_ms.max()), 3) if latencies else None,
+        }
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from api.retention import apply_retention, expired_dataset_ids
+import time
+
+
+class Command(BaseCommand):
+    help = 'Delete datasets that fall outside the DATASET_RETENTION policy'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many datasets would be deleted',
+        )
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and compact every INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            if options['dry_run']:
+                count = len(expired_dataset_ids())
+                self.stdout.write(f'{count} datasets would be deleted')
+            else:
+                count = apply_retention()
+                self.stdout.write(self.style.SUCCESS(f'Deleted {count} datasets'))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
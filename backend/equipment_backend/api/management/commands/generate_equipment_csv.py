@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from api.synthetic import write_synthetic_csv
+
+
+class Command(BaseCommand):
+    help = 'Write a deterministic synthetic equipment CSV with the schema and type mix of the sample data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('rows', type=int, help='Number of equipment rows')
+        parser.add_argument('path', help='File to write')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'w', newline='') as out:
+            write_synthetic_csv(out, options['rows'], options['seed'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['rows']} rows to {options['path']}"))
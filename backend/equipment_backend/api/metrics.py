@@ -0,0 +1,151 @@
+"""
+Prometheus metrics.
+
+With several server processes (e.g. gunicorn workers), set the
+PROMETHEUS_MULTIPROC_DIR environment variable to an empty directory shared
+by all of them before they start. Each process then writes its samples to
+memory-mapped files there and /metrics aggregates them, so it shows the
+totals whichever process serves the scrape. Report worker processes
+inherit the variable and write to the same directory. Under gunicorn, also
+call prometheus_client.multiprocess.mark_process_dead(worker.pid) from the
+child_exit hook.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseForbidden
+import os
+import time
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram, multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # optional dependency
+    prometheus_client = None
+
+
+DEFAULT_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+
+class _NullMetric:
+    """Stands in for every metric when prometheus_client is not installed"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, amount):
+        pass
+
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'http_request_duration_seconds', 'API request latency',
+        ['method', 'route', 'status'],
+    )
+    ROWS_INGESTED = Counter('ingest_rows_total', 'Equipment rows ingested from CSV uploads')
+    BYTES_UPLOADED = Counter('upload_bytes_total', 'Bytes of uploaded files received')
+    REPORTS_GENERATED = Counter('reports_generated_total', 'PDF reports rendered (cache misses)')
+    REPORT_RENDER_SECONDS = Histogram(
+        'report_render_seconds', 'Wall time to render a PDF report',
+        buckets=(0.25, 0.5, 1, 2, 5, 10, 30, 60, 120),
+    )
+    CHART_RENDER_SECONDS = Histogram(
+        'chart_render_seconds', 'Wall time to render the charts of a report',
+        buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+    )
+    INGEST_QUEUE_DEPTH = Gauge(
+        'ingest_queue_depth', 'Uploads waiting in the in-process ingest queues',
+        multiprocess_mode='livesum',
+    )
+else:
+    REQUEST_LATENCY = ROWS_INGESTED = BYTES_UPLOADED = REPORTS_GENERATED = _NullMetric()
+    REPORT_RENDER_SECONDS = CHART_RENDER_SECONDS = INGEST_QUEUE_DEPTH = _NullMetric()
+
+
+class IngestJobCollector:
+    """Background ingest jobs per status, read from the database at scrape time"""
+
+    def collect(self):
+        from django.db.models import Count
+        from .models import IngestJob
+
+        counts = dict(
+            IngestJob.objects
+            .filter(status__in=[IngestJob.STATUS_QUEUED, IngestJob.STATUS_RUNNING])
+            .values_list('status')
+            .annotate(count=Count('id'))
+        )
+        family = GaugeMetricFamily('ingest_jobs', 'Background ingest jobs by status', labels=['status'])
+        for job_status in (IngestJob.STATUS_QUEUED, IngestJob.STATUS_RUNNING):
+            family.add_metric([job_status], counts.get(job_status, 0))
+        yield family
+
+
+def _registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Aggregate the samples every process wrote to the shared directory
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.CollectorRegistry()
+        registry.register(prometheus_client.REGISTRY)
+    registry.register(IngestJobCollector())
+    return registry
+
+
+def metrics_view(request):
+    """Prometheus text exposition, only served to METRICS_ALLOWED_IPS"""
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', DEFAULT_ALLOWED_IPS)
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    if prometheus_client is None:
+        return HttpResponse('prometheus_client is not installed\n', status=503, content_type='text/plain')
+
+    return HttpResponse(
+        prometheus_client.generate_latest(_registry()),
+        content_type=prometheus_client.CONTENT_TYPE_LATEST,
+    )
+
+
+class MetricsMiddleware:
+    """Record the latency of every request by route pattern"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if prometheus_client is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    def observe(self, request, response, start):
+        match = request.resolver_match
+        route = match.route if match is not None else 'unmatched'
+        REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(
+            time.perf_counter() - start
+        )
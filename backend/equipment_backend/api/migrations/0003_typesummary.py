@@ -0,0 +1,48 @@
+# Generated by Django 6.0.1 on 2026-10-17 04:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_ingestjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TypeSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_type', models.CharField(max_length=100)),
+                ('count', models.IntegerField()),
+                ('flowrate_min', models.FloatField()),
+                ('flowrate_max', models.FloatField()),
+                ('flowrate_mean', models.FloatField()),
+                ('flowrate_std', models.FloatField()),
+                ('flowrate_p25', models.FloatField()),
+                ('flowrate_p50', models.FloatField()),
+                ('flowrate_p75', models.FloatField()),
+                ('pressure_min', models.FloatField()),
+                ('pressure_max', models.FloatField()),
+                ('pressure_mean', models.FloatField()),
+                ('pressure_std', models.FloatField()),
+                ('pressure_p25', models.FloatField()),
+                ('pressure_p50', models.FloatField()),
+                ('pressure_p75', models.FloatField()),
+                ('temperature_min', models.FloatField()),
+                ('temperature_max', models.FloatField()),
+                ('temperature_mean', models.FloatField()),
+                ('temperature_std', models.FloatField()),
+                ('temperature_p25', models.FloatField()),
+                ('temperature_p50', models.FloatField()),
+                ('temperature_p75', models.FloatField()),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='type_summaries', to='api.dataset')),
+            ],
+            options={
+                'ordering': ['-count', 'equipment_type'],
+                'constraints': [models.UniqueConstraint(fields=('dataset', 'equipment_type'), name='unique_type_summary')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+PARAMETERS = ['flowrate', 'pressure', 'temperature']
+
+
+def backfill_type_summaries(apps, schema_editor):
+    """Compute per-type statistics for datasets uploaded before they existed"""
+    import pandas as pd
+    
+    Dataset = apps.get_model('api', 'Dataset')
+    Equipment = apps.get_model('api', 'Equipment')
+    TypeSummary = apps.get_model('api', 'TypeSummary')
+    
+    for dataset in Dataset.objects.filter(type_summaries__isnull=True):
+        rows = Equipment.objects.filter(dataset=dataset).values_list(
+            'equipment_type', *PARAMETERS
+        )
+        df = pd.DataFrame.from_records(list(rows), columns=['equipment_type'] + PARAMETERS)
+        
+        summaries = []
+        for eq_type, group in df.groupby('equipment_type', sort=False):
+            fields = {'count': len(group)}
+            for param in PARAMETERS:
+                values = group[param]
+                fields.update({
+                    f'{param}_min': float(values.min()),
+                    f'{param}_max': float(values.max()),
+                    f'{param}_mean': float(values.mean()),
+                    f'{param}_std': float(values.std()) if len(values) > 1 else 0.0,
+                    f'{param}_p25': float(values.quantile(0.25)),
+                    f'{param}_p50': float(values.quantile(0.50)),
+                    f'{param}_p75': float(values.quantile(0.75)),
+                })
+            summaries.append(TypeSummary(dataset=dataset, equipment_type=eq_type, **fields))
+        TypeSummary.objects.bulk_create(summaries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_typesummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_type_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_dataset_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['dataset', 'equipment_name'], name='equipment_dataset_name_idx'),
+        ),
+    ]
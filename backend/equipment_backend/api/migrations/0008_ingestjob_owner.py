@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_equipment_dataset_name_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='owner',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
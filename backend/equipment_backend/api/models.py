@@ -13,9 +13,15 @@ class Dataset(models.Model):
     avg_pressure = models.FloatField()
     avg_temperature = models.FloatField()
     type_distribution = models.TextField()  # JSON string
+    content_hash = models.CharField(max_length=64, blank=True)  # SHA-256 of the uploaded file
+    version = models.PositiveIntegerField(default=1)  # bumped whenever the data changes
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-upload_date']
+        indexes = [
+            models.Index(fields=['user', 'content_hash'], name='dataset_user_hash_idx'),
+        ]
     
     def __str__(self):
         return f"{self.filename} - {self.upload_date}"
@@ -38,5 +44,87 @@ class Equipment(models.Model):
     pressure = models.FloatField()
     temperature = models.FloatField()
     
+    class Meta:
+        indexes = [
+            # Dataset comparisons group and join rows by name
+            models.Index(fields=['dataset', 'equipment_name'], name='equipment_dataset_name_idx'),
+        ]
+    
+    def __str__(self):
+        return self.equipment_name
+
+
+class IngestJob(models.Model):
+    """Model to track a CSV upload that is being ingested in the background"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ingest_jobs')
+    filename = models.CharField(max_length=255)
+    upload_path = models.CharField(max_length=500)
+    content_hash = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    owner = models.CharField(max_length=255, blank=True)  # hostname:pid of the process running it
+    rows_parsed = models.IntegerField(default=0)
+    rows_inserted = models.IntegerField(default=0)
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.filename} - {self.status}"
+
+
+class TypeSummary(models.Model):
+    """Model to store per equipment type statistics of a dataset, computed at ingest"""
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='type_summaries')
+    equipment_type = models.CharField(max_length=100)
+    count = models.IntegerField()
+    
+    flowrate_min = models.FloatField()
+    flowrate_max = models.FloatField()
+    flowrate_mean = models.FloatField()
+    flowrate_std = models.FloatField()
+    flowrate_p25 = models.FloatField()
+    flowrate_p50 = models.FloatField()
+    flowrate_p75 = models.FloatField()
+    
+    pressure_min = models.FloatField()
+    pressure_max = models.FloatField()
+    pressure_mean = models.FloatField()
+    pressure_std = models.FloatField()
+    pressure_p25 = models.FloatField()
+    pressure_p50 = models.FloatField()
+    pressure_p75 = models.FloatField()
+    
+    temperature_min = models.FloatField()
+    temperature_max = models.FloatField()
+    temperature_mean = models.FloatField()
+    temperature_std = models.FloatField()
+    temperature_p25 = models.FloatField()
+    temperature_p50 = models.FloatField()
+    temperature_p75 = models.FloatField()
+    
+    PARAMETERS = ['flowrate', 'pressure', 'temperature']
+    STATISTICS = ['min', 'max', 'mean', 'std', 'p25', 'p50', 'p75']
+    
+    class Meta:
+        ordering = ['-count', 'equipment_type']
+        constraints = [
+            models.UniqueConstraint(fields=['dataset', 'equipment_type'], name='unique_type_summary'),
+        ]
+    
     def __str__(self):
-        return self.equipment_name
\ No newline at end of file
+        return f"{self.equipment_type} ({self.count}) - {self.dataset_id}"
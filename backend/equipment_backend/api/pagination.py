@@ -0,0 +1,22 @@
+from rest_framework.pagination import CursorPagination
+
+
+class EquipmentCursorPagination(CursorPagination):
+    """Cursor pagination for a dataset's equipment rows"""
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = 'id'
+    ordering_query_param = 'ordering'
+    ordering_fields = ['id', 'equipment_name', 'equipment_type',
+                       'flowrate', 'pressure', 'temperature']
+    
+    def get_ordering(self, request, queryset, view):
+        """Order by ?ordering= when it names a known field, with id as tie-breaker"""
+        param = request.query_params.get(self.ordering_query_param)
+        if param and param.lstrip('-') in self.ordering_fields:
+            if param.lstrip('-') == 'id':
+                return (param,)
+            tie_breaker = '-id' if param.startswith('-') else 'id'
+            return (param, tie_breaker)
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,126 @@
+from django.conf import settings
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+# Seconds to wait for the next file's result before giving up on it
+DEFAULT_TIMEOUT = 300
+POLL_INTERVAL = 0.5
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(settings_module):
+    """Set up Django and pre-import pandas once per worker"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    from . import ingest  # noqa: F401  (imports pandas)
+
+
+def _parse(paths):
+    """
+    Parse one CSV in a worker, spooling its chunks to the given path.
+    Returns (stats, None), or (None, error message) when the file cannot
+    be ingested.
+    """
+    from .ingest import IngestError, spool_chunks
+
+    csv_path, spool_path = paths
+    try:
+        return spool_chunks(csv_path, spool_path), None
+    except IngestError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f'Error processing CSV: {str(e)}'
+
+
+def get_pool():
+    """Return the process-wide CSV parsing pool, starting it if needed"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, 'BATCH_UPLOAD_WORKERS', DEFAULT_WORKERS)
+            # Spawned rather than forked, like the report pool: the web
+            # process has threads and open database connections
+            context = multiprocessing.get_context('spawn')
+            _pool = context.Pool(
+                processes=workers,
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'equipment_backend.settings'),),
+            )
+        return _pool
+
+
+def _discard_pool(pool=None):
+    """
+    Kill the pool, e.g. after a worker died or hung; a new one starts on
+    next use. Given a pool, only discard it if it is still the current one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and (pool is None or pool is _pool):
+            _pool.terminate()
+            _pool = None
+
+
+def _next_result(results, pool, timeout):
+    """
+    Wait for the next imap result. Returns None if another batch discarded
+    the pool meanwhile, and raises multiprocessing.TimeoutError once
+    timeout seconds pass without a result.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return results.next(max(0, min(POLL_INTERVAL, deadline - time.monotonic())))
+        except multiprocessing.TimeoutError:
+            if pool is not _pool:
+                return None
+            if time.monotonic() >= deadline:
+                raise
+
+
+def parse_csvs(paths):
+    """
+    Parse CSVs in parallel in the worker pool, yielding _parse() results
+    in order as each becomes available. paths holds a (csv_path,
+    spool_path) pair per file. A file whose result does not arrive within
+    BATCH_PARSE_TIMEOUT (e.g. because its worker died) fails and the pool
+    is replaced for the rest. With BATCH_UPLOAD_WORKERS = 0 the files are
+    parsed one by one in the calling thread instead.
+    """
+    if getattr(settings, 'BATCH_UPLOAD_WORKERS', DEFAULT_WORKERS) <= 0:
+        yield from map(_parse, paths)
+        return
+
+    timeout = getattr(settings, 'BATCH_PARSE_TIMEOUT', DEFAULT_TIMEOUT)
+    remaining = list(paths)
+    while remaining:
+        pool = get_pool()
+        results = pool.imap(_parse, remaining)
+        while remaining:
+            try:
+                result = _next_result(results, pool, timeout)
+            except multiprocessing.TimeoutError:
+                logger.error('Parsing %s timed out after %ss', remaining[0][0], timeout)
+                _discard_pool(pool)
+                remaining.pop(0)
+                yield None, f'Parsing timed out after {timeout} seconds'
+                break
+            if result is None:
+                # The pool was killed with these files in it; parse them again
+                break
+            remaining.pop(0)
+            yield result
+
+
+atexit.register(_discard_pool)
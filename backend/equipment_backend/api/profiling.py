@@ -0,0 +1,152 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+import json
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+_profile = ContextVar('request_profile', default=None)
+
+
+class Profile:
+    """Wall time of named spans and SQL time collected during one request"""
+
+    def __init__(self):
+        self.spans = {}  # name -> [seconds, count]
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+
+    def add(self, name, seconds, count=1):
+        entry = self.spans.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += count
+
+    def merge(self, spans):
+        for name, (seconds, count) in spans.items():
+            self.add(name, seconds, count)
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Database execute wrapper that times every query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - start
+            self.sql_count += 1
+
+    def server_timing(self, total_seconds):
+        metrics = [
+            f'total;dur={total_seconds * 1000:.1f}',
+            f'sql;dur={self.sql_seconds * 1000:.1f};desc="{self.sql_count} queries"',
+        ]
+        metrics.extend(
+            f'{name};dur={seconds * 1000:.1f}'
+            for name, (seconds, _) in self.spans.items()
+        )
+        return ', '.join(metrics)
+
+
+def get_profile():
+    """Return the profile of the current request, or None when not profiling"""
+    return _profile.get()
+
+
+@contextmanager
+def collect():
+    """Collect spans in a new Profile for the duration of the block"""
+    profile = Profile()
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Time the block as a named span of the current request, if it is profiled"""
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute_wrapper(execute, sql, params, many, context)
+
+
+def _install_execute_wrapper(sender, connection, **kwargs):
+    # Installed on every new connection rather than per request: under ASGI
+    # queries run on sync_to_async threads with their own connections, and
+    # the request's profile reaches them through the context variable
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+class ProfilingMiddleware:
+    """
+    Record each request's wall time, SQL query count and SQL time and the
+    spans of the code it ran, and send them out in a Server-Timing header
+    and a log line. Removed from the middleware chain at startup unless
+    REQUEST_PROFILING is on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+        connection_created.connect(_install_execute_wrapper, dispatch_uid='api.profiling')
+        for connection in connections.all(initialized_only=True):
+            _install_execute_wrapper(None, connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with collect() as profile:
+            response = self.get_response(request)
+        return self.finish(request, response, profile, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with collect() as profile:
+            response = await self.get_response(request)
+        return self.finish(request, response, profile, time.perf_counter() - start)
+
+    def finish(self, request, response, profile, total):
+        response['Server-Timing'] = profile.server_timing(total)
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'sql_count': profile.sql_count,
+            'sql_ms': round(profile.sql_seconds * 1000, 1),
+            'spans': {
+                name: {'ms': round(seconds * 1000, 1), 'count': count}
+                for name, (seconds, count) in profile.spans.items()
+            },
+        }
+        logger.info(json.dumps(record), extra={'profile': record})
+        return response
@@ -0,0 +1,66 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from .profiling import span
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed.
+    The output is the same compact UTF-8 JSON DRF produces by default;
+    indented output and installs without orjson use the stock encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with span('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        # Dates and times are left to DRF's encoder so they are formatted
+        # exactly as before
+        return orjson.dumps(
+            data,
+            default=JSONEncoder().default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+
+
+class BinaryRenderer(BaseRenderer):
+    """
+    Renderer for views that stream their own binary body.
+    It only takes part in content negotiation; error payloads are
+    still sent as JSON.
+    """
+    charset = None
+    render_style = 'binary'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, bytearray)):
+            return data
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return FastJSONRenderer().render(data)
+
+
+class ArrowStreamRenderer(BinaryRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+
+
+class ParquetRenderer(BinaryRenderer):
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
+
+
+class NpzRenderer(BinaryRenderer):
+    media_type = 'application/x-npz'
+    format = 'npz'
@@ -0,0 +1,145 @@
+from django.conf import settings
+from .metrics import REPORT_RENDER_SECONDS, REPORTS_GENERATED
+from .report_pool import render_report
+import glob
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import uuid
+
+
+# Bump whenever the report layout changes so cached PDFs are rebuilt
+REPORT_VERSION = '2'
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+_lock = threading.Lock()
+
+
+def get_cache_dir():
+    return getattr(settings, 'REPORT_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'reports'))
+
+
+def report_digest(dataset, detail='summary'):
+    """Hash everything that ends up in the dataset's report"""
+    content = {
+        'version': REPORT_VERSION,
+        'detail': detail,
+        'id': dataset.id,
+        'dataset_version': dataset.version,
+        'filename': dataset.filename,
+        'upload_date': dataset.upload_date.isoformat(),
+        'total_count': dataset.total_count,
+        'avg_flowrate': dataset.avg_flowrate,
+        'avg_pressure': dataset.avg_pressure,
+        'avg_temperature': dataset.avg_temperature,
+        'type_distribution': dataset.type_distribution,
+    }
+    encoded = json.dumps(content, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+def report_path(dataset, detail='summary'):
+    return os.path.join(
+        get_cache_dir(), f'report_{dataset.id}_{detail}_{report_digest(dataset, detail)}.pdf'
+    )
+
+
+def open_report(dataset, detail='summary'):
+    """
+    Return an open binary file with the dataset's PDF report.
+    The report is only rendered when no cached copy matches the
+    dataset's current content. With REPORT_STORAGE = 'memory' nothing
+    is cached: the report is rendered into memory for every request.
+    """
+    if getattr(settings, 'REPORT_STORAGE', 'disk') == 'memory':
+        return _render_in_memory(dataset, detail)
+
+    path = report_path(dataset, detail)
+    try:
+        report = open(path, 'rb')
+    except FileNotFoundError:
+        return _build_report(dataset, path, detail)
+
+    # Mark as recently used for LRU eviction. A concurrent eviction may
+    # unlink the file after it was opened; the open handle still reads it.
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return report
+
+
+def _render_in_memory(dataset, detail):
+    started = time.perf_counter()
+    report = io.BytesIO(render_report(dataset, detail=detail))
+    REPORT_RENDER_SECONDS.observe(time.perf_counter() - started)
+    REPORTS_GENERATED.inc()
+    return report
+
+
+def _build_report(dataset, path, detail):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Render to a private name and move it into place so concurrent
+    # readers never see a half-written file
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        started = time.perf_counter()
+        render_report(dataset, tmp_path, detail)
+        REPORT_RENDER_SECONDS.observe(time.perf_counter() - started)
+        REPORTS_GENERATED.inc()
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # Opened before eviction runs so the new report cannot be pulled
+    # out from under this request
+    report = open(path, 'rb')
+    with _lock:
+        _remove_stale(dataset.id, detail, keep=path)
+        _evict()
+    return report
+
+
+def _remove_stale(dataset_id, detail='*', keep=None):
+    for path in glob.glob(os.path.join(get_cache_dir(), f'report_{dataset_id}_{detail}_*.pdf')):
+        if path != keep:
+            _remove(path)
+
+
+def _evict():
+    """Delete least recently used reports until the cache fits its size budget"""
+    max_bytes = getattr(settings, 'REPORT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+    entries = []
+    for path in glob.glob(os.path.join(get_cache_dir(), '*.pdf')):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def invalidate(dataset_id):
+    """Drop every cached report for a dataset"""
+    with _lock:
+        _remove_stale(dataset_id)
@@ -0,0 +1,133 @@
+from django.conf import settings
+from .metrics import CHART_RENDER_SECONDS
+from .profiling import collect, get_profile
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_TIMEOUT = 60
+# Recycle workers now and then so matplotlib/ReportLab memory cannot pile up
+TASKS_PER_WORKER = 50
+# Seconds between checks that the pool a render waits on is still alive
+POLL_INTERVAL = 0.5
+
+
+class ReportTimeout(Exception):
+    """Raised when a report is not rendered within REPORT_RENDER_TIMEOUT"""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(settings_module):
+    """Set up Django and pre-import the rendering stack once per worker"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    from . import utils  # noqa: F401  (imports matplotlib and ReportLab)
+
+
+def _render(dataset_id, filepath, detail='summary'):
+    """
+    Render in a worker; returns the path (or the PDF bytes when filepath
+    is None) and the spans it recorded
+    """
+    from .models import Dataset
+    from .utils import generate_pdf_report
+
+    dataset = Dataset.objects.get(pk=dataset_id)
+    with collect() as profile:
+        return generate_pdf_report(dataset, filepath=filepath, detail=detail), profile.spans
+
+
+def _record(spans):
+    """
+    Observe the chart render time in this process, where /metrics can see
+    it, and count the render's spans towards the current request
+    """
+    if 'charts' in spans:
+        CHART_RENDER_SECONDS.observe(spans['charts'][0])
+    profile = get_profile()
+    if profile is not None:
+        profile.merge(spans)
+
+
+def get_pool():
+    """Return the process-wide report rendering pool, starting it if needed"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, 'REPORT_WORKERS', DEFAULT_WORKERS)
+            # Spawned rather than forked: the web process has threads and
+            # open database connections that must not leak into workers
+            context = multiprocessing.get_context('spawn')
+            _pool = context.Pool(
+                processes=workers,
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'equipment_backend.settings'),),
+                maxtasksperchild=TASKS_PER_WORKER,
+            )
+        return _pool
+
+
+def _discard_pool(pool=None):
+    """
+    Kill the pool, e.g. after a render hung; a new one starts on next use.
+    Given a pool, only discard it if it is still the current one, so a
+    late timeout cannot kill its replacement.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and (pool is None or pool is _pool):
+            _pool.terminate()
+            _pool = None
+
+
+def render_report(dataset, filepath=None, detail='summary'):
+    """
+    Render the dataset's PDF report to filepath in a worker process and
+    wait for it; without a filepath the PDF bytes are returned. With
+    REPORT_WORKERS = 0 the report is rendered in the calling thread instead.
+    """
+    if getattr(settings, 'REPORT_WORKERS', DEFAULT_WORKERS) <= 0:
+        from .utils import generate_pdf_report
+        outer = get_profile()
+        with collect() as profile:
+            result = generate_pdf_report(dataset, filepath=filepath, detail=detail)
+        if outer is not None:
+            outer.sql_count += profile.sql_count
+            outer.sql_seconds += profile.sql_seconds
+        _record(profile.spans)
+        return result
+
+    timeout = getattr(settings, 'REPORT_RENDER_TIMEOUT', DEFAULT_TIMEOUT)
+    args = (dataset.pk, filepath, detail)
+    deadline = time.monotonic() + timeout
+    pool = get_pool()
+    result = pool.apply_async(_render, args)
+    while not result.ready():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.error('Rendering report for dataset %s timed out after %ss', dataset.pk, timeout)
+            _discard_pool(pool)
+            raise ReportTimeout(f'Report rendering timed out after {timeout} seconds')
+        result.wait(min(remaining, POLL_INTERVAL))
+        if not result.ready() and pool is not _pool:
+            # Another render hung and its pool was killed with this task
+            # in it; render again in the new pool within the same deadline
+            pool = get_pool()
+            result = pool.apply_async(_render, args)
+    path, spans = result.get()
+    _record(spans)
+    return path
+
+
+atexit.register(_discard_pool)
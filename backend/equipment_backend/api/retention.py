@@ -0,0 +1,156 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from .models import Dataset
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY = {
+    'max_datasets': 5,       # keep the N newest datasets per user
+    'max_age_days': None,    # delete datasets older than this
+    'max_total_rows': None,  # keep the newest datasets within this many rows per user
+}
+
+# Dataset ids per DELETE statement, well under SQLite's variable limit
+DELETE_BATCH_SIZE = 500
+
+_executor = None
+_pending_users = set()
+_pending_lock = threading.Lock()
+
+
+def get_policy():
+    policy = dict(DEFAULT_POLICY)
+    policy.update(getattr(settings, 'DATASET_RETENTION', {}))
+    return policy
+
+
+def expired_dataset_ids(user=None, policy=None):
+    """Return ids of datasets that fall outside the retention policy"""
+    policy = policy or get_policy()
+    datasets = Dataset.objects.all()
+    if user is not None:
+        datasets = datasets.filter(user=user)
+
+    newest_first = [F('upload_date').desc(), F('id').desc()]
+    expired = set()
+
+    if policy['max_datasets'] is not None:
+        ranked = datasets.annotate(
+            rank=Window(RowNumber(), partition_by=[F('user')], order_by=newest_first)
+        )
+        expired.update(
+            ranked.filter(rank__gt=policy['max_datasets']).values_list('id', flat=True)
+        )
+
+    if policy['max_age_days'] is not None:
+        cutoff = timezone.now() - timedelta(days=policy['max_age_days'])
+        expired.update(datasets.filter(upload_date__lt=cutoff).values_list('id', flat=True))
+
+    if policy['max_total_rows'] is not None:
+        # Running row total from the newest dataset down; the newest
+        # dataset is always kept even if it alone exceeds the budget
+        ranked = datasets.annotate(
+            rank=Window(RowNumber(), partition_by=[F('user')], order_by=newest_first),
+            rows_so_far=Window(Sum('total_count'), partition_by=[F('user')], order_by=newest_first),
+        )
+        expired.update(
+            ranked.filter(rows_so_far__gt=policy['max_total_rows'], rank__gt=1)
+            .values_list('id', flat=True)
+        )
+
+    return sorted(expired)
+
+
+def retained_datasets(user, policy=None):
+    """
+    The user's datasets the retention policy keeps, newest first: the
+    complement of expired_dataset_ids(user), whether or not the expired
+    ones have been deleted yet (see DATASET_RETENTION_MODE)
+    """
+    policy = policy or get_policy()
+    datasets = Dataset.objects.filter(user=user).order_by('-upload_date', '-id')
+
+    # Age only cuts off the oldest datasets, so the running totals below
+    # are the same as over all of the user's datasets
+    if policy['max_age_days'] is not None:
+        cutoff = timezone.now() - timedelta(days=policy['max_age_days'])
+        datasets = datasets.filter(upload_date__gte=cutoff)
+
+    if policy['max_total_rows'] is not None:
+        newest_first = [F('upload_date').desc(), F('id').desc()]
+        datasets = datasets.annotate(
+            rank=Window(RowNumber(), order_by=newest_first),
+            rows_so_far=Window(Sum('total_count'), order_by=newest_first),
+        ).filter(Q(rows_so_far__lte=policy['max_total_rows']) | Q(rank=1))
+
+    if policy['max_datasets'] is not None:
+        datasets = datasets[:policy['max_datasets']]
+    return datasets
+
+
+def delete_datasets(dataset_ids):
+    """
+    Delete datasets with set-based statements. Equipment and TypeSummary
+    have no signals or dependents of their own, so the cascade removes
+    their rows with one DELETE ... WHERE dataset_id IN (...) per batch
+    instead of loading them.
+    """
+    deleted = 0
+    for start in range(0, len(dataset_ids), DELETE_BATCH_SIZE):
+        batch = dataset_ids[start:start + DELETE_BATCH_SIZE]
+        _, per_model = Dataset.objects.filter(id__in=batch).delete()
+        deleted += per_model.get(Dataset._meta.label, 0)
+    return deleted
+
+
+def apply_retention(user=None):
+    """Enforce the retention policy for one user, or everyone when user is None"""
+    dataset_ids = expired_dataset_ids(user)
+    if not dataset_ids:
+        return 0
+    deleted = delete_datasets(dataset_ids)
+    logger.info('Retention removed %d datasets', deleted)
+    return deleted
+
+
+def _run_in_background(user_id):
+    close_old_connections()
+    try:
+        with _pending_lock:
+            _pending_users.discard(user_id)
+        apply_retention(user_id)
+    except Exception:
+        logger.exception('Background retention for user %s failed', user_id)
+    finally:
+        connection.close()
+
+
+def enforce_retention(user):
+    """
+    Called after a dataset is added. Depending on DATASET_RETENTION_MODE
+    the policy is applied right away ('inline'), on a background thread
+    ('background'), or left to the compact_datasets command ('periodic').
+    """
+    mode = getattr(settings, 'DATASET_RETENTION_MODE', 'inline')
+    if mode == 'inline':
+        apply_retention(user)
+    elif mode == 'background':
+        global _executor
+        with _pending_lock:
+            # One pending run per user is enough
+            if user.pk in _pending_users:
+                return
+            _pending_users.add(user.pk)
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='retention')
+        transaction.on_commit(lambda: _executor.submit(_run_in_background, user.pk))
+    elif mode != 'periodic':
+        raise ValueError(f'Unknown DATASET_RETENTION_MODE: {mode}')
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Dataset, Equipment
+from .models import Dataset, Equipment, IngestJob, TypeSummary
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -27,7 +27,21 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
-class EquipmentSerializer(serializers.ModelSerializer):
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer that takes an optional `fields` argument
+    to limit which fields are output
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class EquipmentSerializer(DynamicFieldsModelSerializer):
     """Serializer for Equipment model"""
     class Meta:
         model = Equipment
@@ -35,9 +49,33 @@ class EquipmentSerializer(serializers.ModelSerializer):
                   'pressure', 'temperature']
 
 
+class EquipmentRowsField(serializers.Field):
+    """
+    Read-only list of a dataset's equipment built straight from
+    values_list tuples. Gives the same output as
+    EquipmentSerializer(many=True) without creating a model instance
+    and running every field's to_representation per row.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+    
+    def to_representation(self, dataset):
+        fields = EquipmentSerializer.Meta.fields
+        rows = (
+            Equipment.objects
+            .filter(dataset_id=dataset.pk)
+            .order_by('id')
+            .values_list(*fields)
+            .iterator(chunk_size=10000)
+        )
+        return [dict(zip(fields, row)) for row in rows]
+
+
 class DatasetSerializer(serializers.ModelSerializer):
     """Serializer for Dataset model"""
-    equipment = EquipmentSerializer(many=True, read_only=True)
+    equipment = EquipmentRowsField()
     type_distribution = serializers.SerializerMethodField()
     
     class Meta:
@@ -62,4 +100,30 @@ class DatasetListSerializer(serializers.ModelSerializer):
                   'type_distribution']
     
     def get_type_distribution(self, obj):
-        return obj.get_type_distribution()
\ No newline at end of file
+        return obj.get_type_distribution()
+
+
+class IngestJobSerializer(serializers.ModelSerializer):
+    """Serializer for background CSV ingestion jobs"""
+    dataset_id = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = IngestJob
+        fields = ['id', 'filename', 'status', 'rows_parsed', 'rows_inserted',
+                  'dataset_id', 'error', 'created_at', 'updated_at']
+
+
+class TypeSummarySerializer(serializers.ModelSerializer):
+    """Serializer for per-type statistics, grouped by parameter"""
+    class Meta:
+        model = TypeSummary
+        fields = ['equipment_type', 'count']
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for param in TypeSummary.PARAMETERS:
+            data[param] = {
+                stat: getattr(instance, f'{param}_{stat}')
+                for stat in TypeSummary.STATISTICS
+            }
+        return data
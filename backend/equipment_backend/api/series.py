@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.core.cache import cache
+from .models import Equipment
+import math
+import numpy as np
+
+
+PARAMETERS = ['flowrate', 'pressure', 'temperature']
+METHODS = ['lttb', 'minmax']
+
+DEFAULT_POINTS = 1000
+DEFAULT_MAX_POINTS = 10000
+DEFAULT_CACHE_TIMEOUT = 60 * 60
+
+
+def lttb(y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of y (x is the row index).
+    Returns the indices of the kept points; first and last are always kept.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=np.float64)
+    # Interior points are split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+
+        # Average point of the next bucket (the last point for the final bucket)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        # Keep the point forming the largest triangle with the previous
+        # kept point and the next bucket's average
+        px, py = x[previous], y[previous]
+        areas = np.abs(
+            (px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py)
+        )
+        previous = start + int(np.argmax(areas))
+        indices[i + 1] = previous
+
+    return indices
+
+
+def minmax(y, threshold):
+    """
+    Min/max binning: split y into threshold // 2 bins and keep the lowest
+    and highest point of each, in index order.
+    Returns the indices of the kept points.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 2:
+        return np.arange(n)
+
+    bin_size = math.ceil(n / (threshold // 2))
+    bins = math.ceil(n / bin_size)
+    padded = np.full(bins * bin_size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(bins, bin_size)
+
+    offsets = np.arange(bins) * bin_size
+    lows = offsets + np.nanargmin(padded, axis=1)
+    highs = offsets + np.nanargmax(padded, axis=1)
+    return np.unique(np.concatenate([lows, highs]))
+
+
+DOWNSAMPLERS = {
+    'lttb': lttb,
+    'minmax': minmax,
+}
+
+
+def get_max_points():
+    return getattr(settings, 'SERIES_MAX_POINTS', DEFAULT_MAX_POINTS)
+
+
+def get_series(dataset, parameter, points, method):
+    """
+    Return a downsampled series of one parameter over the dataset's rows.
+    Results are cached per (dataset, parameter, method, points).
+    """
+    cache_key = f'series:{dataset.pk}:v{dataset.version}:{parameter}:{method}:{points}'
+    series = cache.get(cache_key)
+    if series is not None:
+        return series
+
+    values = Equipment.objects.filter(dataset_id=dataset.pk).order_by('id').values_list(parameter, flat=True)
+    y = np.fromiter(values.iterator(chunk_size=50000), dtype=np.float64)
+    indices = DOWNSAMPLERS[method](y, points)
+
+    series = {
+        'dataset_id': dataset.pk,
+        'parameter': parameter,
+        'method': method,
+        'total_points': len(y),
+        'points': len(indices),
+        'x': indices.tolist(),
+        'y': y[indices].tolist(),
+    }
+    cache.set(cache_key, series, getattr(settings, 'SERIES_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT))
+    return series
@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import revoke_token, revoke_user
+from .models import Dataset
+from . import report_cache
+
+
+@receiver(post_delete, sender=Dataset)
+def invalidate_report_cache(sender, instance, **kwargs):
+    """Remove cached PDF reports of deleted datasets"""
+    report_cache.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a token (e.g. after logout) as soon as it is deleted"""
+    revoke_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Drop cached lookups of a user that was changed (deactivated, renamed) or deleted"""
+    revoke_user(instance.pk)
@@ -0,0 +1,60 @@
+import io
+import numpy as np
+import pandas as pd
+
+
+# Equipment types in the proportions of sample_equipment_data.csv, with the
+# name prefix and (mean, spread) of flowrate, pressure and temperature seen
+# for each type there
+EQUIPMENT_PROFILES = [
+    # type, name prefix, weight, flowrate, pressure, temperature
+    ('Reactor', 'Reactor-A', 3, (155.5, 5.0), (26.7, 1.5), (357.1, 8.0)),
+    ('Heat Exchanger', 'Heat-Exchanger-B', 3, (205.5, 5.0), (16.8, 1.3), (287.9, 7.0)),
+    ('Pump', 'Pump-C', 3, (179.4, 3.5), (44.0, 1.7), (88.0, 2.5)),
+    ('Distillation Column', 'Distillation-D', 2, (123.2, 3.0), (10.9, 0.7), (153.0, 2.5)),
+    ('Compressor', 'Compressor-E', 2, (93.9, 1.5), (79.4, 1.2), (119.4, 1.0)),
+    ('Storage Tank', 'Tank-F', 2, (290.3, 10.0), (5.0, 0.2), (23.8, 1.3)),
+]
+
+COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+DEFAULT_CHUNK_SIZE = 500000
+
+
+def synthetic_frames(rows, seed=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield DataFrames with the columns of an equipment CSV, chunk_size rows
+    at a time, rows rows in total. The same seed always gives the same data.
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.array([profile[2] for profile in EQUIPMENT_PROFILES], dtype=np.float64)
+    weights /= weights.sum()
+    prefixes = np.array([profile[1] for profile in EQUIPMENT_PROFILES])
+    types = np.array([profile[0] for profile in EQUIPMENT_PROFILES])
+    means = np.array([[p[0] for p in profile[3:]] for profile in EQUIPMENT_PROFILES])
+    spreads = np.array([[p[1] for p in profile[3:]] for profile in EQUIPMENT_PROFILES])
+
+    for start in range(0, rows, chunk_size):
+        size = min(chunk_size, rows - start)
+        kinds = rng.choice(len(EQUIPMENT_PROFILES), size=size, p=weights)
+        values = rng.normal(means[kinds], spreads[kinds]).round(1)
+        numbers = np.arange(start + 1, start + size + 1).astype(str)
+        yield pd.DataFrame({
+            'Equipment Name': np.char.add(prefixes[kinds], numbers),
+            'Type': types[kinds],
+            'Flowrate': values[:, 0],
+            'Pressure': values[:, 1],
+            'Temperature': values[:, 2],
+        }, columns=COLUMNS)
+
+
+def write_synthetic_csv(out, rows, seed=0):
+    """Write a synthetic equipment CSV with the given number of rows to a text file"""
+    for i, frame in enumerate(synthetic_frames(rows, seed)):
+        frame.to_csv(out, index=False, header=(i == 0))
+
+
+def synthetic_csv(rows, seed=0):
+    """Return a synthetic equipment CSV as an in-memory binary file"""
+    text = io.StringIO()
+    write_synthetic_csv(text, rows, seed)
+    return io.BytesIO(text.getvalue().encode('utf-8'))
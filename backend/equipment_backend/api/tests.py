@@ -1,3 +1,1171 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.authtoken.models import Token
+from .authentication import CachedTokenAuthentication, get_token_cache
+from . import parse_pool
+from .export import EXPORT_COLUMNS, iter_column_batches
+from .jobs import FairJobQueue, process_owner, recover_jobs, run_ingest_job
+from .ingest import NUMERIC_COLUMNS, PARAMETER_FIELDS, ColumnStats, append_csv, ingest_csv
+from .models import Dataset, Equipment, IngestJob, TypeSummary
+from .renderers import FastJSONRenderer
+from .report_cache import report_path
+from .retention import apply_retention, expired_dataset_ids, retained_datasets
+from .series import METHODS, PARAMETERS
+from .serializers import DatasetSerializer, EquipmentSerializer
+from .synthetic import synthetic_csv
+from .utils import DETAIL_LEVELS, SUMMARY_ROWS, _detail_tables
+from rest_framework.test import APIClient
+from unittest import mock
+import gzip
+import hashlib
+import io
+import json
+import multiprocessing
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import unittest
+import zipfile
 
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # optional dependency
+    pyarrow = None
 
+
+class ModelDatasetSerializer(DatasetSerializer):
+    """DatasetSerializer as it was before the values_list fast path"""
+    equipment = EquipmentSerializer(many=True, read_only=True)
+
+
+class DatasetSerializerParityTests(TestCase):
+    """The fast equipment path must render exactly like the ModelSerializer path"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('parity', password='parity')
+        cls.dataset = Dataset.objects.create(
+            user=user,
+            filename='parity.csv',
+            total_count=6,
+            avg_flowrate=0.1 + 0.2,
+            avg_pressure=1e-7,
+            avg_temperature=-40.0,
+            type_distribution=json.dumps({'Pump': 3, 'Échangeur': 3}),
+        )
+        rows = [
+            ('P-101', 'Pump', 120.5, 5.2, 110.0),
+            ('P-102', 'Pump', 0.1 + 0.2, 1e-7, -40.0),
+            ('P-103', 'Pump', 1e20, 123456789.123456, 0.0),
+            ('É-201 "quoted"', 'Échangeur', 3.0, 2.5, 99.99),
+            ('HX\\202\n', 'Échangeur', 7, 8, 9),
+            ('热交换器', 'Échangeur', 1.0 / 3, 2.0 / 3, 5e-324),
+        ]
+        Equipment.objects.bulk_create([
+            Equipment(
+                dataset=cls.dataset, equipment_name=name, equipment_type=eq_type,
+                flowrate=flowrate, pressure=pressure, temperature=temperature
+            )
+            for name, eq_type, flowrate, pressure, temperature in rows
+        ])
+        # Another dataset's rows must not leak into the output
+        other = Dataset.objects.create(
+            user=user, filename='other.csv', total_count=1, avg_flowrate=1,
+            avg_pressure=1, avg_temperature=1, type_distribution=json.dumps({'Pump': 1})
+        )
+        Equipment.objects.create(
+            dataset=other, equipment_name='X-1', equipment_type='Pump',
+            flowrate=1, pressure=1, temperature=1
+        )
+
+    def test_data_matches(self):
+        dataset = Dataset.objects.get(pk=self.dataset.pk)
+        self.assertEqual(
+            DatasetSerializer(dataset).data,
+            ModelDatasetSerializer(dataset).data,
+        )
+
+    def test_rendered_json_matches_byte_for_byte(self):
+        dataset = Dataset.objects.get(pk=self.dataset.pk)
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            with self.subTest(renderer=type(renderer).__name__):
+                self.assertEqual(
+                    renderer.render(DatasetSerializer(dataset).data),
+                    renderer.render(ModelDatasetSerializer(dataset).data),
+                )
+
+    def test_empty_dataset(self):
+        dataset = Dataset.objects.create(
+            user=self.dataset.user, filename='empty.csv', total_count=0, avg_flowrate=0,
+            avg_pressure=0, avg_temperature=0, type_distribution='{}'
+        )
+        self.assertEqual(
+            JSONRenderer().render(DatasetSerializer(dataset).data),
+            JSONRenderer().render(ModelDatasetSerializer(dataset).data),
+        )
+
+
+class InsertModeTests(TestCase):
+    """The orm and columnar insert modes must store the same rows"""
+
+    CSV = (
+        'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+        ',Pump,1,2,3\n'
+        'P-102,,4,5,6\n'
+        '101,Valve,7,8,9\n'
+    )
+
+    def test_blank_and_numeric_text_cells(self):
+        user = User.objects.create_user('modes')
+        stored = {}
+        for mode in ('orm', 'columnar'):
+            with override_settings(CSV_INGEST_INSERT_MODE=mode):
+                dataset = ingest_csv(io.StringIO(self.CSV), user, f'{mode}.csv')
+            stored[mode] = list(
+                dataset.equipment.order_by('id').values_list(
+                    'equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature'
+                )
+            )
+        self.assertEqual(stored['orm'], stored['columnar'])
+        self.assertEqual(stored['columnar'][0][0], 'nan')
+        self.assertEqual(stored['columnar'][1][1], 'nan')
+        self.assertEqual(stored['columnar'][2][0], '101')
+
+
+class TokenCacheRevocationTests(TestCase):
+    """A token revoked in another process must stop authenticating here"""
+
+    def setUp(self):
+        cache.clear()
+        get_token_cache().clear()
+        self.user = User.objects.create_user('revoked')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def cached_elsewhere(self):
+        # Another process still holds a lookup cached before the change
+        with mock.patch('api.authentication.time.time', return_value=0.0):
+            get_token_cache().set(self.token.key, self.user, self.token)
+
+    def test_deleted_token(self):
+        self.auth.authenticate_credentials(self.token.key)
+        Token.objects.filter(pk=self.token.pk).delete()
+        self.cached_elsewhere()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_deactivated_user(self):
+        self.user.is_active = False
+        self.user.save()
+        self.cached_elsewhere()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_unrevoked_token_is_served_from_cache(self):
+        self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+
+
+def synthetic_frame(rows, seed):
+    """Synthetic equipment rows as a DataFrame and as CSV text"""
+    frame = pd.read_csv(synthetic_csv(rows, seed))
+    return frame, frame.to_csv(index=False)
+
+
+class ColumnStatsTests(TestCase):
+    """Chunk-wise statistics must equal those of the whole column"""
+
+    def test_merge_matches_numpy(self):
+        rng = np.random.default_rng(1)
+        values = rng.normal(100, 15, 5000)
+        values[rng.random(5000) < 0.05] = np.nan
+        stats = ColumnStats()
+        for chunk in np.array_split(values, [1, 2, 50, 51, 1234, 4000]):
+            stats.update(chunk)
+        present = values[~np.isnan(values)]
+        self.assertEqual(stats.count, len(present))
+        self.assertAlmostEqual(stats.mean, present.mean(), places=9)
+        self.assertAlmostEqual(stats.std, present.std(ddof=1), places=9)
+        self.assertEqual(stats.min, present.min())
+        self.assertEqual(stats.max, present.max())
+
+
+class TypeSummaryTests(TestCase):
+    """Per-type statistics of a multi-chunk ingest compared with pandas"""
+
+    ROWS = 3000
+    CHUNK_SIZE = 97
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('stats')
+        cls.frame, text = synthetic_frame(cls.ROWS, seed=3)
+        cls.dataset = ingest_csv(
+            io.StringIO(text), cls.user, 'stats.csv', chunk_size=cls.CHUNK_SIZE
+        )
+
+    def expected(self):
+        grouped = self.frame.groupby('Type')[NUMERIC_COLUMNS]
+        return {
+            'count': self.frame.groupby('Type').size(),
+            'min': grouped.min(),
+            'max': grouped.max(),
+            'mean': grouped.mean(),
+            'std': grouped.std(),
+            'p25': grouped.quantile(0.25),
+            'p50': grouped.quantile(0.5),
+            'p75': grouped.quantile(0.75),
+        }
+
+    def test_summaries_match_pandas(self):
+        expected = self.expected()
+        summaries = TypeSummary.objects.filter(dataset=self.dataset)
+        self.assertEqual(
+            sorted(s.equipment_type for s in summaries), sorted(expected['count'].index)
+        )
+        for summary in summaries:
+            eq_type = summary.equipment_type
+            self.assertEqual(summary.count, expected['count'][eq_type])
+            for col in NUMERIC_COLUMNS:
+                for stat in TypeSummary.STATISTICS:
+                    with self.subTest(type=eq_type, column=col, stat=stat):
+                        self.assertAlmostEqual(
+                            getattr(summary, f'{PARAMETER_FIELDS[col]}_{stat}'),
+                            expected[stat].loc[eq_type, col],
+                            places=6,
+                        )
+
+    def test_sampled_percentiles_are_close(self):
+        # Below the type sizes, so quartiles come from the bottom-k sample
+        with override_settings(TYPE_STATS_SAMPLE_SIZE=300):
+            dataset = ingest_csv(
+                io.StringIO(self.frame.to_csv(index=False)), self.user, 'sampled.csv',
+                chunk_size=self.CHUNK_SIZE
+            )
+        expected = self.expected()
+        for summary in TypeSummary.objects.filter(dataset=dataset):
+            eq_type = summary.equipment_type
+            for col in NUMERIC_COLUMNS:
+                prefix = PARAMETER_FIELDS[col]
+                spread = expected['max'].loc[eq_type, col] - expected['min'].loc[eq_type, col]
+                for stat in ('p25', 'p50', 'p75'):
+                    with self.subTest(type=eq_type, column=col, stat=stat):
+                        error = getattr(summary, f'{prefix}_{stat}') - expected[stat].loc[eq_type, col]
+                        self.assertLess(abs(error), 0.1 * spread)
+                # The moments are exact whatever the sample size
+                self.assertAlmostEqual(
+                    getattr(summary, f'{prefix}_std'), expected['std'].loc[eq_type, col], places=6
+                )
+
+    def test_stats_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        data = client.get(f'/api/datasets/{self.dataset.pk}/stats/').json()
+        self.assertEqual(data['total_count'], self.ROWS)
+        self.assertAlmostEqual(data['avg_flowrate'], self.frame['Flowrate'].mean(), places=6)
+        expected = self.expected()
+        for entry in data['types']:
+            eq_type = entry['equipment_type']
+            self.assertEqual(entry['count'], expected['count'][eq_type])
+            for col in NUMERIC_COLUMNS:
+                self.assertAlmostEqual(
+                    entry[PARAMETER_FIELDS[col]]['p50'], expected['p50'].loc[eq_type, col], places=6
+                )
+
+
+class AppendTests(TestCase):
+    """Appending a file must give the statistics of ingesting both at once"""
+
+    def test_append_matches_single_ingest(self):
+        user = User.objects.create_user('append')
+        first, first_text = synthetic_frame(1200, seed=5)
+        second, second_text = synthetic_frame(700, seed=6)
+        combined_text = pd.concat([first, second]).to_csv(index=False)
+
+        appended = ingest_csv(io.StringIO(first_text), user, 'first.csv', chunk_size=150)
+        appended = append_csv(io.StringIO(second_text), appended, chunk_size=150)
+        combined = ingest_csv(io.StringIO(combined_text), user, 'combined.csv', chunk_size=150)
+
+        self.assertEqual(appended.total_count, combined.total_count)
+        self.assertEqual(appended.get_type_distribution(), combined.get_type_distribution())
+        for field in ('avg_flowrate', 'avg_pressure', 'avg_temperature'):
+            self.assertAlmostEqual(getattr(appended, field), getattr(combined, field), places=9)
+        self.assertEqual(appended.equipment.count(), combined.total_count)
+
+        expected = {s.equipment_type: s for s in TypeSummary.objects.filter(dataset=combined)}
+        summaries = TypeSummary.objects.filter(dataset=appended)
+        self.assertEqual(sorted(s.equipment_type for s in summaries), sorted(expected))
+        for summary in summaries:
+            other = expected[summary.equipment_type]
+            self.assertEqual(summary.count, other.count)
+            for param in TypeSummary.PARAMETERS:
+                for stat in ('min', 'max', 'mean', 'std'):
+                    with self.subTest(type=summary.equipment_type, param=param, stat=stat):
+                        self.assertAlmostEqual(
+                            getattr(summary, f'{param}_{stat}'),
+                            getattr(other, f'{param}_{stat}'),
+                            places=9,
+                        )
+
+
+class RetentionTests(TestCase):
+    """expired_dataset_ids and the dataset list must agree on the policy"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('retention')
+        self.other = User.objects.create_user('retention-other')
+        start = timezone.now() - timedelta(days=30)
+        # Oldest first: a dataset per day with these row counts
+        self.datasets = [
+            self.create(self.user, rows, start + timedelta(days=day))
+            for day, rows in enumerate([10, 20, 30, 40, 50, 60, 70])
+        ]
+        self.other_datasets = [
+            self.create(self.other, 5, start + timedelta(days=day)) for day in range(3)
+        ]
+
+    def create(self, user, rows, upload_date):
+        dataset = Dataset.objects.create(
+            user=user, filename=f'{rows}.csv', total_count=rows,
+            avg_flowrate=0, avg_pressure=0, avg_temperature=0, type_distribution='{}',
+        )
+        # upload_date is auto_now_add, so it is set afterwards
+        Dataset.objects.filter(pk=dataset.pk).update(upload_date=upload_date)
+        return dataset
+
+    def policy(self, **overrides):
+        return {'max_datasets': None, 'max_age_days': None, 'max_total_rows': None, **overrides}
+
+    def ids(self, datasets):
+        return sorted(dataset.id for dataset in datasets)
+
+    def assertRetained(self, policy, expected):
+        self.assertEqual(expired_dataset_ids(self.user, policy), self.ids(
+            dataset for dataset in self.datasets if dataset not in expected
+        ))
+        self.assertEqual(
+            [dataset.id for dataset in retained_datasets(self.user, policy)],
+            [dataset.id for dataset in reversed(expected)],
+        )
+
+    def test_max_datasets_keeps_newest_per_user(self):
+        self.assertRetained(self.policy(max_datasets=3), self.datasets[-3:])
+        self.assertEqual(
+            expired_dataset_ids(policy=self.policy(max_datasets=2)),
+            self.ids(self.datasets[:-2] + self.other_datasets[:1]),
+        )
+
+    def test_max_age_days(self):
+        self.assertRetained(self.policy(max_age_days=26.5), self.datasets[-3:])
+
+    def test_max_total_rows_counts_from_newest(self):
+        # 70 + 60 + 50 = 180 fits, adding 40 does not
+        self.assertRetained(self.policy(max_total_rows=200), self.datasets[-3:])
+        self.assertRetained(self.policy(max_total_rows=180), self.datasets[-3:])
+
+    def test_max_total_rows_always_keeps_newest(self):
+        self.assertRetained(self.policy(max_total_rows=1), self.datasets[-1:])
+
+    def test_policies_combine(self):
+        policy = self.policy(max_datasets=4, max_age_days=28.5, max_total_rows=200)
+        self.assertRetained(policy, self.datasets[-3:])
+        policy = self.policy(max_datasets=2, max_age_days=28.5, max_total_rows=200)
+        self.assertRetained(policy, self.datasets[-2:])
+
+    def test_dataset_list_follows_policy(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for limit in (2, 6):
+            with override_settings(DATASET_RETENTION={'max_datasets': limit}):
+                response = client.get('/api/datasets/')
+            self.assertEqual(
+                [dataset['id'] for dataset in response.json()],
+                [dataset.id for dataset in reversed(self.datasets[-limit:])],
+            )
+
+
+class JobQueueTests(TestCase):
+    """Background ingestion through the job queue"""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        settings = override_settings(MEDIA_ROOT=self.media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Jobs are run on the test thread, whose connection must stay open
+        for name in ('close_old_connections', 'connection'):
+            patcher = mock.patch(f'api.jobs.{name}')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user('jobs')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, name='jobs.csv'):
+        upload = io.BytesIO(content)
+        upload.name = name
+        # Keep the worker threads out of it; the test runs the job itself
+        with self.captureOnCommitCallbacks(execute=False):
+            return self.client.post(
+                '/api/datasets/upload/', {'file': upload}, format='multipart',
+                HTTP_PREFER='respond-async',
+            )
+
+    def test_upload_is_queued_and_completes(self):
+        response = self.upload(synthetic_csv(500).getvalue())
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual(body['status'], IngestJob.STATUS_QUEUED)
+        self.assertTrue(body['status_url'].endswith(f"/api/datasets/jobs/{body['job_id']}/"))
+        self.assertEqual(response['Location'], body['status_url'])
+
+        job = IngestJob.objects.get(pk=body['job_id'])
+        self.assertTrue(os.path.exists(job.upload_path))
+        run_ingest_job(job.pk)
+
+        detail = self.client.get(body['status_url']).json()
+        self.assertEqual(detail['status'], IngestJob.STATUS_COMPLETED)
+        dataset = Dataset.objects.get(user=self.user)
+        self.assertEqual(detail['dataset_id'], dataset.pk)
+        self.assertEqual(detail['rows_inserted'], 500)
+        self.assertEqual(dataset.equipment.count(), 500)
+        self.assertFalse(os.path.exists(job.upload_path))
+
+    def test_other_users_job_is_not_found(self):
+        job_id = self.upload(synthetic_csv(10).getvalue()).json()['job_id']
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('jobs-other'))
+        self.assertEqual(other.get(f'/api/datasets/jobs/{job_id}/').status_code, 404)
+
+    def test_failed_job_removes_spooled_file(self):
+        job_id = self.upload(b'Name,Kind\nP-1,Pump\n').json()['job_id']
+        job = IngestJob.objects.get(pk=job_id)
+        run_ingest_job(job_id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestJob.STATUS_FAILED)
+        self.assertIn('CSV must contain columns', job.error)
+        self.assertIsNone(job.dataset)
+        self.assertFalse(os.path.exists(job.upload_path))
+        self.assertFalse(Dataset.objects.filter(user=self.user).exists())
+
+    def test_recovery_fails_only_abandoned_jobs(self):
+        jobs = {}
+        for owner in ('this', 'stopped', 'elsewhere-stale', 'elsewhere-live'):
+            path = os.path.join(self.media.name, f'{owner}.csv')
+            open(path, 'w').close()
+            jobs[owner] = IngestJob.objects.create(
+                user=self.user, filename=f'{owner}.csv', upload_path=path,
+                status=IngestJob.STATUS_RUNNING,
+            )
+        host = process_owner().rpartition(':')[0]
+        IngestJob.objects.filter(pk=jobs['this'].pk).update(owner=process_owner())
+        # No process has this pid: it is above the usual pid_max
+        IngestJob.objects.filter(pk=jobs['stopped'].pk).update(owner=f'{host}:4194305')
+        stale = timezone.now() - timedelta(minutes=5)
+        IngestJob.objects.filter(pk=jobs['elsewhere-stale'].pk).update(
+            owner='other-host:1', updated_at=stale
+        )
+        IngestJob.objects.filter(pk=jobs['elsewhere-live'].pk).update(
+            owner='other-host:2', updated_at=stale
+        )
+        cache.set(f"ingest-job-progress:{jobs['elsewhere-live'].pk}", (10, 0))
+        self.addCleanup(cache.clear)
+        queued = IngestJob.objects.create(
+            user=self.user, filename='queued.csv', upload_path='queued.csv'
+        )
+
+        queue = mock.Mock()
+        with self.assertLogs('api.jobs', 'WARNING'):
+            recover_jobs(queue)
+
+        failed = {'stopped', 'elsewhere-stale'}
+        for owner, job in jobs.items():
+            job.refresh_from_db()
+            with self.subTest(owner=owner):
+                expected = IngestJob.STATUS_FAILED if owner in failed else IngestJob.STATUS_RUNNING
+                self.assertEqual(job.status, expected)
+                self.assertEqual(os.path.exists(job.upload_path), owner not in failed)
+        queue.submit.assert_called_once_with(self.user.pk, queued.pk)
+
+    def test_round_robin_between_users(self):
+        queue = FairJobQueue(handler=None, workers=0)
+        for user_id, job_id in [(1, 'a1'), (1, 'a2'), (1, 'a3'), (2, 'b1'), (3, 'c1'), (2, 'b2')]:
+            queue.submit(user_id, job_id)
+
+        taken = [queue._take() for _ in range(6)]
+        self.assertEqual(taken, ['a1', 'b1', 'c1', 'a2', 'b2', 'a3'])
+        self.assertEqual(queue.queued_count(), 0)
+
+
+def named_file(name, content):
+    upload = io.BytesIO(content)
+    upload.name = name
+    return upload
+
+
+def zip_file(name, members):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as out:
+        for member, content in members.items():
+            out.writestr(member, content)
+    return named_file(name, archive.getvalue())
+
+
+@override_settings(BATCH_UPLOAD_WORKERS=0, DATASET_RETENTION={'max_datasets': None})
+class BatchUploadTests(TestCase):
+    """Batch uploads of several CSVs and ZIP archives"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('batch')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, *files):
+        return self.client.post('/api/datasets/upload/batch/', {'files': list(files)}, format='multipart')
+
+    def results(self, *files):
+        response = self.post(*files)
+        self.assertEqual(response.status_code, 200)
+        return [
+            (result['filename'], result['status'], result.get('dataset', {}).get('total_count'))
+            for result in response.json()['results']
+        ]
+
+    def test_files_and_zip_members(self):
+        archive = zip_file('shift.zip', {
+            'unit/c.csv': synthetic_csv(200, seed=3).getvalue(),
+            'd.csv': synthetic_csv(100, seed=4).getvalue(),
+            'readme.txt': b'notes',
+            '__MACOSX/._c.csv': b'resource fork',
+        })
+        # Parsed in real worker processes
+        with override_settings(BATCH_UPLOAD_WORKERS=2):
+            self.addCleanup(parse_pool._discard_pool)
+            results = self.results(
+                named_file('a.csv', synthetic_csv(300, seed=1).getvalue()),
+                archive,
+                named_file('notes.txt', b'hi'),
+                named_file('b.csv', synthetic_csv(500, seed=2).getvalue()),
+            )
+
+        self.assertEqual(results, [
+            ('a.csv', 'created', 300),
+            ('c.csv', 'created', 200),
+            ('d.csv', 'created', 100),
+            ('readme.txt', 'error', None),
+            ('notes.txt', 'error', None),
+            ('b.csv', 'created', 500),
+        ])
+        datasets = Dataset.objects.filter(user=self.user)
+        self.assertEqual(
+            {dataset.filename: dataset.equipment.count() for dataset in datasets},
+            {'a.csv': 300, 'c.csv': 200, 'd.csv': 100, 'b.csv': 500},
+        )
+        single = ingest_csv(synthetic_csv(500, seed=2), self.user, 'single.csv')
+        batched = datasets.get(filename='b.csv')
+        self.assertEqual(batched.get_type_distribution(), single.get_type_distribution())
+        self.assertAlmostEqual(batched.avg_pressure, single.avg_pressure, places=9)
+
+    def test_invalid_csv_does_not_stop_the_batch(self):
+        results = self.results(
+            named_file('bad.csv', b'Name,Kind\nP-1,Pump\n'),
+            named_file('good.csv', synthetic_csv(50).getvalue()),
+        )
+        self.assertEqual(results, [('bad.csv', 'error', None), ('good.csv', 'created', 50)])
+
+    def test_duplicates(self):
+        content = synthetic_csv(80, seed=7).getvalue()
+        existing = ingest_csv(
+            io.BytesIO(content), self.user, 'existing.csv', content_hash=hashlib.sha256(content).hexdigest()
+        )
+        other = synthetic_csv(90, seed=8).getvalue()
+
+        response = self.post(
+            named_file('again.csv', content),
+            named_file('new.csv', other),
+            zip_file('copies.zip', {'copy.csv': other}),
+        )
+        results = response.json()['results']
+        self.assertEqual(results[0]['status'], 'duplicate')
+        self.assertEqual(results[0]['dataset']['id'], existing.pk)
+        self.assertEqual(results[1]['status'], 'created')
+        self.assertEqual(results[2], {'filename': 'copy.csv', 'status': 'duplicate', 'duplicate_of': 'new.csv'})
+        self.assertEqual(Dataset.objects.filter(user=self.user).count(), 2)
+
+    def test_another_users_content_is_not_a_duplicate(self):
+        content = synthetic_csv(40).getvalue()
+        ingest_csv(
+            io.BytesIO(content), User.objects.create_user('batch-other'), 'theirs.csv',
+            content_hash=hashlib.sha256(content).hexdigest()
+        )
+        self.assertEqual(self.results(named_file('mine.csv', content)), [('mine.csv', 'created', 40)])
+
+    @override_settings(BATCH_UPLOAD_MAX_FILES=2)
+    def test_too_many_files(self):
+        csv = synthetic_csv(10).getvalue()
+        response = self.post(
+            named_file('a.csv', csv), zip_file('more.zip', {'b.csv': csv, 'c.csv': csv})
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'A batch may contain at most 2 files'})
+        self.assertFalse(Dataset.objects.exists())
+
+    def test_size_limit(self):
+        csv = synthetic_csv(100).getvalue()
+        with override_settings(BATCH_UPLOAD_MAX_BYTES=len(csv) * 2 - 1):
+            response = self.post(named_file('a.csv', csv), named_file('b.csv', csv))
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'Batch is too large'})
+
+            response = self.post(named_file('a.csv', csv), zip_file('b.zip', {'b.csv': csv}))
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'Batch is too large once unzipped'})
+        self.assertFalse(Dataset.objects.exists())
+
+        with override_settings(BATCH_UPLOAD_MAX_BYTES=len(csv) * 2):
+            response = self.post(named_file('a.csv', csv), zip_file('b.zip', {'b/b.csv': csv + b' '}))
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                self.results(named_file('a.csv', csv), zip_file('c.zip', {'c.csv': csv[:-1] + b'\n'})),
+                [('a.csv', 'created', 100), ('c.csv', 'duplicate', None)],
+            )
+
+    def test_retention_runs_once_per_batch(self):
+        with mock.patch('api.batch.enforce_retention') as enforce:
+            self.results(*[
+                named_file(f'{seed}.csv', synthetic_csv(20, seed=seed).getvalue()) for seed in range(3)
+            ])
+        enforce.assert_called_once_with(self.user)
+
+        with mock.patch('api.batch.enforce_retention') as enforce:
+            self.results(named_file('notes.txt', b'hi'))
+        enforce.assert_not_called()
+
+    @override_settings(BATCH_UPLOAD_WORKERS=2, BATCH_PARSE_TIMEOUT=0)
+    def test_lost_worker_result_times_out(self):
+        class Results:
+            def __init__(self, paths, lost):
+                self.items = [None if path[0] in lost else parse_pool._parse(path) for path in paths]
+
+            def next(self, timeout):
+                item = self.items.pop(0)
+                if item is None:
+                    raise multiprocessing.TimeoutError
+                return item
+
+        class Pool:
+            def __init__(self, lost):
+                self.lost = lost
+
+            def imap(self, func, paths):
+                return Results(paths, self.lost)
+
+            terminate = mock.Mock()
+
+        pools = []
+        self.addCleanup(setattr, parse_pool, '_pool', None)
+
+        def get_pool():
+            # The first pool loses the first file, as if its worker died
+            pools.append(Pool(lost=[paths[0][0]] if not pools else []))
+            parse_pool._pool = pools[-1]
+            return pools[-1]
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        paths = []
+        for seed in range(3):
+            path = os.path.join(directory.name, f'{seed}.csv')
+            with open(path, 'wb') as out:
+                out.write(synthetic_csv(30, seed=seed).getvalue())
+            paths.append((path, f'{path}.chunks'))
+
+        with mock.patch('api.parse_pool.get_pool', get_pool), self.assertLogs('api.parse_pool', 'ERROR'):
+            results = list(parse_pool.parse_csvs(paths))
+
+        self.assertEqual(results[0], (None, 'Parsing timed out after 0 seconds'))
+        self.assertEqual([stats.count for stats, _ in results[1:]], [30, 30])
+        self.assertEqual(len(pools), 2)
+        Pool.terminate.assert_called_once_with()
+        self.assertIs(parse_pool._pool, pools[1])
+
+
+@override_settings(DATASET_RETENTION={'max_datasets': None})
+class ConditionalRequestTests(TestCase):
+    """ETags on the dataset list, detail and report"""
+
+    def setUp(self):
+        reports = tempfile.TemporaryDirectory()
+        self.addCleanup(reports.cleanup)
+        settings = override_settings(REPORT_CACHE_DIR=reports.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user('conditional')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.dataset = self.upload('first.csv', seed=1)
+
+    def upload(self, name, seed, rows=50):
+        response = self.client.post(
+            '/api/datasets/upload/', {'file': named_file(name, synthetic_csv(rows, seed=seed).getvalue())},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 201)
+        return Dataset.objects.get(pk=response.json()['id'])
+
+    def etag(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_not_modified_skips_the_view(self):
+        pk = self.dataset.pk
+        cases = [
+            ('/api/datasets/', 'api.views.DatasetListSerializer'),
+            (f'/api/datasets/{pk}/', 'api.views.DatasetSerializer'),
+            (f'/api/datasets/{pk}/report/', 'api.views.open_report'),
+        ]
+        for url, target in cases:
+            with self.subTest(url=url):
+                etag = self.etag(url)
+                with mock.patch(target) as skipped:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                skipped.assert_not_called()
+
+    def test_upload_changes_list_etag(self):
+        before = self.etag('/api/datasets/')
+        self.upload('second.csv', seed=2)
+        response = self.client.get('/api/datasets/', HTTP_IF_NONE_MATCH=before)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], before)
+
+    def test_append_changes_dataset_etags(self):
+        urls = ['/api/datasets/', f'/api/datasets/{self.dataset.pk}/', f'/api/datasets/{self.dataset.pk}/report/']
+        before = [self.etag(url) for url in urls]
+        response = self.client.post(
+            f'/api/datasets/{self.dataset.pk}/append/',
+            {'file': named_file('more.csv', synthetic_csv(20, seed=9).getvalue())}, format='multipart',
+        )
+        self.assertEqual(response.status_code, 200)
+        for url, etag in zip(urls, before):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_retention_delete_changes_list_etag(self):
+        second = self.upload('second.csv', seed=2)
+        before = self.etag('/api/datasets/')
+        with override_settings(DATASET_RETENTION={'max_datasets': 1}):
+            apply_retention(self.user)
+        self.assertFalse(Dataset.objects.filter(pk=self.dataset.pk).exists())
+
+        response = self.client.get('/api/datasets/', HTTP_IF_NONE_MATCH=before)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([dataset['id'] for dataset in response.json()], [second.pk])
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_SIZE=1024)
+    def test_compressed_response_still_not_modified(self):
+        # The middleware reads its settings when the client first loads it
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        url = f'/api/datasets/{self.dataset.pk}/'
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(json.loads(gzip.decompress(response.content))['id'], self.dataset.pk)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+
+class DuplicateUploadTests(TestCase):
+    """Uploading identical bytes again returns the existing dataset"""
+
+    def setUp(self):
+        self.content = synthetic_csv(120, seed=11).getvalue()
+        self.user = User.objects.create_user('duplicates')
+
+    def upload(self, user, name='plant.csv'):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post('/api/datasets/upload/', {'file': named_file(name, self.content)}, format='multipart')
+
+    def test_reupload_returns_existing_dataset(self):
+        first = self.upload(self.user)
+        self.assertEqual(first.status_code, 201)
+        rows = Equipment.objects.count()
+
+        again = self.upload(self.user, name='renamed.csv')
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(Dataset.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Equipment.objects.count(), rows)
+
+    def test_other_user_gets_own_dataset(self):
+        mine = self.upload(self.user).json()
+        theirs = self.upload(User.objects.create_user('duplicates-other'))
+        self.assertEqual(theirs.status_code, 201)
+        self.assertNotEqual(theirs.json()['id'], mine['id'])
+        self.assertEqual(Equipment.objects.count(), 240)
+
+
+@override_settings(REPORT_WORKERS=0)
+class ReportDetailTests(TestCase):
+    """Summary and full-detail PDF reports"""
+
+    def setUp(self):
+        reports = tempfile.TemporaryDirectory()
+        self.addCleanup(reports.cleanup)
+        self.reports = reports.name
+        settings = override_settings(REPORT_CACHE_DIR=self.reports)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user('reports')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.dataset = ingest_csv(synthetic_csv(250, seed=12), self.user, 'report.csv')
+
+    def detail_rows(self, detail):
+        """Render the report and return the rows of its equipment tables"""
+        rows = []
+
+        def capture(detail_rows, style):
+            detail_rows = list(detail_rows)
+            rows.extend(detail_rows)
+            return _detail_tables(detail_rows, style)
+
+        with mock.patch('api.utils._detail_tables', side_effect=capture):
+            response = self.client.get(f'/api/datasets/{self.dataset.pk}/report/', {'detail': detail})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        return rows
+
+    def test_full_lists_every_row(self):
+        names = list(self.dataset.equipment.order_by('id').values_list('equipment_name', flat=True))
+        self.assertEqual([row[0] for row in self.detail_rows('full')], [name[:20] for name in names])
+
+    def test_summary_lists_first_rows(self):
+        rows = self.detail_rows('summary')
+        self.assertEqual(len(rows), SUMMARY_ROWS + 1)
+        self.assertEqual(rows[-1], ['...'] * 5)
+
+    def test_unknown_detail_is_rejected(self):
+        response = self.client.get(f'/api/datasets/{self.dataset.pk}/report/', {'detail': 'everything'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'detail must be one of: summary, full'})
+
+    def test_cache_entry_and_etag_per_detail(self):
+        self.assertNotEqual(report_path(self.dataset, 'summary'), report_path(self.dataset, 'full'))
+        etags = {}
+        for detail in DETAIL_LEVELS:
+            response = self.client.get(f'/api/datasets/{self.dataset.pk}/report/', {'detail': detail})
+            b''.join(response.streaming_content)
+            etags[detail] = response['ETag']
+        self.assertNotEqual(etags['summary'], etags['full'])
+        self.assertEqual(
+            sorted(os.listdir(self.reports)),
+            sorted(os.path.basename(report_path(self.dataset, detail)) for detail in DETAIL_LEVELS),
+        )
+
+        # Each ETag only matches its own detail level
+        url = f'/api/datasets/{self.dataset.pk}/report/'
+        response = self.client.get(url, {'detail': 'full'}, HTTP_IF_NONE_MATCH=etags['full'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, {'detail': 'full'}, HTTP_IF_NONE_MATCH=etags['summary'])
+        self.assertEqual(response.status_code, 200)
+        b''.join(response.streaming_content)
+
+
+class EquipmentPageTests(TestCase):
+    """Summary and cursor-paginated equipment endpoints"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('pages')
+        cls.dataset = ingest_csv(synthetic_csv(250, seed=13), cls.user, 'pages.csv')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def pages(self, **params):
+        """Follow the next links from the first page; returns every row"""
+        response = self.client.get(f'/api/datasets/{self.dataset.pk}/equipment/', params)
+        rows = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            rows.extend(body['results'])
+            if not body['next']:
+                return rows
+            response = self.client.get(body['next'])
+
+    def test_pages_cover_every_row_once(self):
+        rows = self.pages(page_size=60)
+        expected = list(self.dataset.equipment.order_by('id').values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in rows], expected)
+        self.assertEqual(
+            rows[0],
+            EquipmentSerializer(self.dataset.equipment.order_by('id').first()).data,
+        )
+
+    def test_ordering_with_tie_breaker(self):
+        for ordering in ('equipment_type', '-flowrate'):
+            with self.subTest(ordering=ordering):
+                rows = self.pages(page_size=70, ordering=ordering)
+                field = ordering.lstrip('-')
+                descending = ordering.startswith('-')
+                # Ties are broken by id in the same direction
+                expected = sorted(self.dataset.equipment.values_list(field, 'id'), reverse=descending)
+                self.assertEqual([(row[field], row['id']) for row in rows], expected)
+
+    def test_fields(self):
+        rows = self.pages(page_size=100, fields='equipment_name, flowrate', ordering='-pressure')
+        self.assertEqual(len(rows), 250)
+        self.assertEqual({tuple(row) for row in rows}, {('equipment_name', 'flowrate')})
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(
+            f'/api/datasets/{self.dataset.pk}/equipment/', {'fields': 'flowrate,colour,dataset'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Unknown fields: colour, dataset'})
+
+    def test_other_users_dataset_is_not_found(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('pages-other'))
+        for suffix in ('summary/', 'equipment/'):
+            with self.subTest(suffix=suffix):
+                response = client.get(f'/api/datasets/{self.dataset.pk}/{suffix}')
+                self.assertEqual(response.status_code, 404)
+
+    def test_summary_has_no_rows(self):
+        response = self.client.get(f'/api/datasets/{self.dataset.pk}/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_count'], 250)
+        self.assertNotIn('equipment', response.json())
+
+
+class ExportTests(TestCase):
+    """Binary columnar export of a dataset's equipment"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('export')
+        cls.dataset = ingest_csv(synthetic_csv(250, seed=14), cls.user, 'export.csv')
+        cls.expected = pd.DataFrame(
+            list(cls.dataset.equipment.order_by('id').values_list(*EXPORT_COLUMNS)),
+            columns=EXPORT_COLUMNS,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, extension, **kwargs):
+        response = self.client.get(f'/api/datasets/{self.dataset.pk}/export/', **kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Disposition'], f'attachment; filename="dataset_{self.dataset.pk}.{extension}"'
+        )
+        return b''.join(response.streaming_content)
+
+    def assertFrameEqual(self, frame):
+        pd.testing.assert_frame_equal(frame, self.expected, check_dtype=False)
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_arrow_in_record_batches(self):
+        # Several batches, so the stream is written a batch at a time
+        with mock.patch.object(iter_column_batches, '__defaults__', (100,)):
+            data = self.export('arrow', HTTP_ACCEPT='application/vnd.apache.arrow.stream')
+        reader = pyarrow.ipc.open_stream(data)
+        batches = list(reader)
+        self.assertEqual([batch.num_rows for batch in batches], [100, 100, 50])
+        self.assertFrameEqual(pyarrow.Table.from_batches(batches).to_pandas())
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_parquet(self):
+        data = self.export('parquet', data={'format': 'parquet'})
+        self.assertFrameEqual(pyarrow.parquet.read_table(io.BytesIO(data)).to_pandas())
+
+    def test_npz(self):
+        data = self.export('npz', HTTP_ACCEPT='application/x-npz')
+        with np.load(io.BytesIO(data)) as arrays:
+            self.assertEqual(sorted(arrays.files), sorted(EXPORT_COLUMNS))
+            self.assertFrameEqual(pd.DataFrame({col: arrays[col] for col in EXPORT_COLUMNS}))
+
+    def test_unknown_format_is_not_acceptable(self):
+        response = self.client.get(f'/api/datasets/{self.dataset.pk}/export/', HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 406)
+
+
+class SeriesTests(TestCase):
+    """Downsampled chart series"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('series')
+        cls.dataset = ingest_csv(synthetic_csv(2000, seed=15), cls.user, 'series.csv')
+
+    def setUp(self):
+        # Series are cached per dataset id, which later tests may reuse
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def series(self, **params):
+        return self.client.get(f'/api/datasets/{self.dataset.pk}/series/', params)
+
+    def test_points_are_taken_from_the_rows(self):
+        for parameter in PARAMETERS:
+            values = list(self.dataset.equipment.order_by('id').values_list(parameter, flat=True))
+            for method in METHODS:
+                with self.subTest(parameter=parameter, method=method):
+                    body = self.series(parameter=parameter, method=method, points=150).json()
+                    self.assertEqual(body['total_points'], 2000)
+                    self.assertLessEqual(body['points'], 150)
+                    self.assertGreater(body['points'], 100)
+                    self.assertEqual(len(body['x']), body['points'])
+                    self.assertEqual(body['x'], sorted(set(body['x'])))
+                    self.assertEqual(body['y'], [values[x] for x in body['x']])
+
+    def test_lttb_keeps_end_points(self):
+        body = self.series(points=50).json()
+        self.assertEqual(body['points'], 50)
+        self.assertEqual((body['x'][0], body['x'][-1]), (0, 1999))
+
+    def test_minmax_keeps_extremes(self):
+        body = self.series(parameter='pressure', method='minmax', points=40).json()
+        pressures = list(self.dataset.equipment.values_list('pressure', flat=True))
+        self.assertEqual((min(body['y']), max(body['y'])), (min(pressures), max(pressures)))
+
+    def test_small_dataset_is_returned_whole(self):
+        body = self.series(points=5000).json()
+        self.assertEqual(body['points'], 2000)
+        self.assertEqual(body['x'], list(range(2000)))
+
+    @override_settings(SERIES_MAX_POINTS=500)
+    def test_invalid_parameters_are_rejected(self):
+        cases = [
+            ({'parameter': 'viscosity'}, 'parameter must be one of: flowrate, pressure, temperature'),
+            ({'method': 'average'}, 'method must be one of: lttb, minmax'),
+            ({'points': 501}, 'points must be an integer between 3 and 500'),
+            ({'points': 2}, 'points must be an integer between 3 and 500'),
+            ({'points': 'many'}, 'points must be an integer between 3 and 500'),
+        ]
+        for params, error in cases:
+            with self.subTest(params=params):
+                response = self.series(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': error})
+
+    def test_append_invalidates_cached_series(self):
+        self.assertEqual(self.series(points=100).json()['total_points'], 2000)
+        append_csv(synthetic_csv(10, seed=16), self.dataset)
+        self.assertEqual(self.series(points=100).json()['total_points'], 2010)
+
+
+class CompareTests(TestCase):
+    """Side-by-side comparison of datasets"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('compare')
+        cls.frames = []
+        cls.datasets = []
+        for seed, rows in ((17, 300), (18, 200), (19, 250)):
+            frame, text = synthetic_frame(rows, seed)
+            cls.frames.append(frame)
+            cls.datasets.append(ingest_csv(io.StringIO(text), cls.user, f'{seed}.csv'))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def compare(self, ids):
+        return self.client.get('/api/datasets/compare/', {'ids': ','.join(map(str, ids))})
+
+    def test_matches_pandas(self):
+        # The second dataset is the baseline
+        order = [1, 0, 2]
+        response = self.compare([self.datasets[i].pk for i in order])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        frames = [self.frames[i] for i in order]
+        self.assertEqual(body['baseline'], self.datasets[1].pk)
+
+        for entry, frame in zip(body['datasets'], frames):
+            self.assertEqual(entry['total_count'], len(frame))
+            for column, field in PARAMETER_FIELDS.items():
+                self.assertAlmostEqual(entry[f'avg_{field}'], frame[column].mean(), places=9)
+                if frame is frames[0]:
+                    self.assertIsNone(entry[f'avg_{field}_delta'])
+                else:
+                    self.assertAlmostEqual(
+                        entry[f'avg_{field}_delta'], frame[column].mean() - frames[0][column].mean(), places=9
+                    )
+
+        by_type = [frame.groupby('Type').agg(count=('Type', 'size'), **{
+            field: (column, 'mean') for column, field in PARAMETER_FIELDS.items()
+        }) for frame in frames]
+        self.assertEqual([row['equipment_type'] for row in body['types']], sorted(by_type[0].index))
+        for row in body['types']:
+            expected = [stats.loc[row['equipment_type']] for stats in by_type]
+            self.assertEqual(row['count'], [int(stats['count']) for stats in expected])
+            for field in PARAMETER_FIELDS.values():
+                for value, stats in zip(row[f'{field}_mean'], expected):
+                    self.assertAlmostEqual(value, stats[field], places=9)
+                self.assertIsNone(row[f'{field}_mean_delta'][0])
+                for delta, value in zip(row[f'{field}_mean_delta'][1:], row[f'{field}_mean'][1:]):
+                    self.assertAlmostEqual(delta, value - row[f'{field}_mean'][0], places=9)
+
+        # Equipment that appears in at least two of the datasets
+        by_name = [frame.groupby('Equipment Name')[list(PARAMETER_FIELDS)].mean() for frame in frames]
+        counts = pd.concat([pd.Series(1, index=stats.index) for stats in by_name]).groupby(level=0).sum()
+        shared = sorted(counts[counts >= 2].index)
+        self.assertGreater(len(shared), 10)
+        self.assertEqual([row['equipment_name'] for row in body['equipment']], shared)
+        for row in body['equipment']:
+            name = row['equipment_name']
+            for column, field in PARAMETER_FIELDS.items():
+                for value, stats in zip(row[field], by_name):
+                    if name in stats.index:
+                        self.assertAlmostEqual(value, stats.loc[name, column], places=9)
+                    else:
+                        self.assertIsNone(value)
+
+    def test_invalid_ids(self):
+        first, second, third = (dataset.pk for dataset in self.datasets)
+        with override_settings(DATASET_COMPARE_MAX=2):
+            for ids in ([first], [first, first], [first, second, third], ['x', first]):
+                with self.subTest(ids=ids):
+                    response = self.compare(ids)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(
+                        response.json(), {'error': 'ids must list between 2 and 2 distinct dataset ids'}
+                    )
+
+        other = ingest_csv(synthetic_csv(10), User.objects.create_user('compare-other'), 'other.csv')
+        response = self.compare([first, other.pk])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': f'Dataset not found: {other.pk}'})
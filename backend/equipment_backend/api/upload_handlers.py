@@ -0,0 +1,36 @@
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from .metrics import BYTES_UPLOADED
+import hashlib
+
+
+class HashingUploadMixin:
+    """
+    Compute a SHA-256 of each uploaded file while its chunks arrive.
+    The hex digest is set on the resulting file as `content_hash`.
+    """
+    def new_file(self, *args, **kwargs):
+        # Set before super() since MemoryFileUploadHandler may raise StopFutureHandlers
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+    
+    def receive_data_chunk(self, raw_data, start):
+        passed_on = super().receive_data_chunk(raw_data, start)
+        if passed_on is None:
+            # This handler kept the chunk
+            self.hasher.update(raw_data)
+        return passed_on
+    
+    def file_complete(self, file_size):
+        file_obj = super().file_complete(file_size)
+        if file_obj is not None:
+            file_obj.content_hash = self.hasher.hexdigest()
+            BYTES_UPLOADED.inc(file_size)
+        return file_obj
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    """Small uploads kept in memory"""
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    """Large uploads streamed to a temporary file"""
@@ -1,6 +1,10 @@
 # api/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI, serve uploads, reports and dataset reads with async views
+io_views = async_views if getattr(settings, 'API_ASYNC_VIEWS', False) else views
 
 urlpatterns = [
     # Authentication
@@ -8,11 +12,21 @@ urlpatterns = [
     path('auth/login/', views.login, name='login'),
     path('auth/logout/', views.logout, name='logout'),
     path('auth/user/', views.current_user, name='current_user'),
+    path('auth/cache-stats/', views.auth_cache_stats, name='auth_cache_stats'),
     
     # Dataset operations
-    path('datasets/', views.dataset_list, name='dataset_list'),
-    path('datasets/upload/', views.upload_csv, name='upload_csv'),
-    path('datasets/<int:pk>/', views.dataset_detail, name='dataset_detail'),
+    path('datasets/', io_views.dataset_list, name='dataset_list'),
+    path('datasets/upload/', io_views.upload_csv, name='upload_csv'),
+    path('datasets/upload/batch/', io_views.batch_upload, name='batch_upload'),
+    path('datasets/compare/', views.dataset_compare, name='dataset_compare'),
+    path('datasets/jobs/<int:pk>/', views.ingest_job_detail, name='ingest_job_detail'),
+    path('datasets/<int:pk>/', io_views.dataset_detail, name='dataset_detail'),
+    path('datasets/<int:pk>/summary/', io_views.dataset_summary, name='dataset_summary'),
+    path('datasets/<int:pk>/stats/', io_views.dataset_stats, name='dataset_stats'),
+    path('datasets/<int:pk>/series/', views.dataset_series, name='dataset_series'),
+    path('datasets/<int:pk>/equipment/', views.dataset_equipment, name='dataset_equipment'),
+    path('datasets/<int:pk>/append/', views.append_csv_rows, name='append_csv'),
+    path('datasets/<int:pk>/export/', views.dataset_export, name='dataset_export'),
     path('datasets/<int:pk>/delete/', views.dataset_delete, name='dataset_delete'),
-    path('datasets/<int:pk>/report/', views.generate_report, name='generate_report'),
+    path('datasets/<int:pk>/report/', io_views.generate_report, name='generate_report'),
 ]
\ No newline at end of file
@@ -5,29 +5,86 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.platypus import Image as RLImage
 from datetime import datetime
-import os
-from django.conf import settings
+from .models import Equipment
+from .profiling import span
 import matplotlib
 matplotlib.use('Agg')  # Use non-GUI backend
 import matplotlib.pyplot as plt
 import io
+import itertools
 
 
-def generate_pdf_report(dataset):
+# 'summary' lists the first SUMMARY_ROWS equipment rows, 'full' all of them
+DETAIL_LEVELS = ['summary', 'full']
+SUMMARY_ROWS = 20
+# Rows per details table; about one page, so ReportLab never has to split
+# a huge table and layout work stays linear in the row count
+ROWS_PER_TABLE = 40
+# Rows fetched from the database at a time in full-detail mode
+ROW_CHUNK_SIZE = 2000
+
+DETAIL_COLUMNS = ['equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
+
+
+class LazyStory(list):
     """
-    Generate a PDF report for the given dataset
-    Returns the path to the generated PDF file
+    Flowable list for doc.build() that is topped up from an iterator as
+    ReportLab consumes it, so only a handful of flowables (and the rows
+    in them) exist at any time instead of the whole document.
     """
-    # Create reports directory if it doesn't exist
-    reports_dir = os.path.join(settings.MEDIA_ROOT, 'reports')
-    os.makedirs(reports_dir, exist_ok=True)
+    def __init__(self, flowables, low_water=4):
+        super().__init__()
+        self._pending = iter(flowables)
+        self._low_water = low_water
     
-    # Generate filename
-    filename = f"report_{dataset.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    filepath = os.path.join(reports_dir, filename)
+    def __len__(self):
+        # build() checks len() before taking each flowable
+        while super().__len__() < self._low_water:
+            flowable = next(self._pending, None)
+            if flowable is None:
+                break
+            self.append(flowable)
+        return super().__len__()
+
+
+def _detail_row(row):
+    name, eq_type, flowrate, pressure, temperature = row
+    return [
+        name[:20],  # Truncate long names
+        eq_type[:15],
+        f'{flowrate:.1f}',
+        f'{pressure:.1f}',
+        f'{temperature:.1f}'
+    ]
+
+
+def _detail_tables(rows, style):
+    """Yield the equipment details as tables of ROWS_PER_TABLE rows each"""
+    header = ['Name', 'Type', 'Flowrate', 'Pressure', 'Temp']
+    col_widths = [1.8*inch, 1.5*inch, 1.2*inch, 1.2*inch, 1.2*inch]
+    rows = iter(rows)
+    first = True
+    while True:
+        segment = list(itertools.islice(rows, ROWS_PER_TABLE))
+        if not segment and not first:
+            return
+        first = False
+        table = Table([header] + segment, colWidths=col_widths, repeatRows=1)
+        table.setStyle(style)
+        yield table
+
+
+def generate_pdf_report(dataset, filepath=None, detail='summary'):
+    """
+    Generate a PDF report for the given dataset
+    Writes to filepath and returns it if given, otherwise builds the PDF
+    in memory and returns its bytes. With detail='full' the equipment
+    details table lists every row instead of the first SUMMARY_ROWS.
+    """
+    buffer = io.BytesIO() if filepath is None else None
     
     # Create PDF
-    doc = SimpleDocTemplate(filepath, pagesize=letter)
+    doc = SimpleDocTemplate(buffer if buffer is not None else filepath, pagesize=letter)
     story = []
     styles = getSampleStyleSheet()
     
@@ -129,11 +186,13 @@ def generate_pdf_report(dataset):
     story.append(Spacer(1, 0.3*inch))
     
     # Generate charts
-    chart_path = generate_charts(dataset)
-    if chart_path:
+    # Timed as a span; report_pool turns it into the chart metric
+    with span('charts'):
+        chart_png = generate_charts(dataset)
+    if chart_png:
         story.append(Paragraph("Data Visualization", heading_style))
         story.append(Spacer(1, 0.1*inch))
-        img = RLImage(chart_path, width=6*inch, height=4*inch)
+        img = RLImage(chart_png, width=6*inch, height=4*inch)
         story.append(img)
     
     # Equipment Details Table
@@ -141,22 +200,7 @@ def generate_pdf_report(dataset):
     story.append(Paragraph("Equipment Details", heading_style))
     story.append(Spacer(1, 0.2*inch))
     
-    equipment_data = [['Name', 'Type', 'Flowrate', 'Pressure', 'Temp']]
-    
-    for equipment in dataset.equipment.all()[:20]:  # Limit to first 20
-        equipment_data.append([
-            equipment.equipment_name[:20],  # Truncate long names
-            equipment.equipment_type[:15],
-            f'{equipment.flowrate:.1f}',
-            f'{equipment.pressure:.1f}',
-            f'{equipment.temperature:.1f}'
-        ])
-    
-    if dataset.equipment.count() > 20:
-        equipment_data.append(['...', '...', '...', '...', '...'])
-    
-    equip_table = Table(equipment_data, colWidths=[1.8*inch, 1.5*inch, 1.2*inch, 1.2*inch, 1.2*inch])
-    equip_table.setStyle(TableStyle([
+    equip_style = TableStyle([
         ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#9b59b6')),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
         ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
@@ -166,33 +210,55 @@ def generate_pdf_report(dataset):
         ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
         ('GRID', (0, 0), (-1, -1), 1, colors.black),
         ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-    ]))
+    ])
     
-    story.append(equip_table)
+    rows = (
+        Equipment.objects
+        .filter(dataset_id=dataset.pk)
+        .order_by('id')
+        .values_list(*DETAIL_COLUMNS)
+    )
+    if detail == 'full':
+        # Streamed from the database while the PDF is laid out
+        detail_rows = (_detail_row(row) for row in rows.iterator(chunk_size=ROW_CHUNK_SIZE))
+    else:
+        detail_rows = [_detail_row(row) for row in rows[:SUMMARY_ROWS]]
+        if dataset.total_count > SUMMARY_ROWS:
+            detail_rows.append(['...', '...', '...', '...', '...'])
     
     # Footer
-    story.append(Spacer(1, 0.5*inch))
-    footer = Paragraph(
-        f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | Chemical Equipment Visualizer",
-        styles['Normal']
-    )
-    story.append(footer)
+    footer = [
+        Spacer(1, 0.5*inch),
+        Paragraph(
+            f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | Chemical Equipment Visualizer",
+            styles['Normal']
+        ),
+    ]
     
     # Build PDF
-    doc.build(story)
+    with span('pdf'):
+        doc.build(LazyStory(itertools.chain(story, _detail_tables(detail_rows, equip_style), footer)))
     
+    if buffer is not None:
+        return buffer.getvalue()
     return filepath
 
 
 def generate_charts(dataset):
-    """Generate matplotlib charts for the dataset"""
+    """Generate matplotlib charts for the dataset as an in-memory PNG"""
+    fig = None
     try:
         fig, axes = plt.subplots(2, 2, figsize=(12, 10))
         fig.suptitle('Equipment Analysis Dashboard', fontsize=16, fontweight='bold')
         
         # Get data
         type_dist = dataset.get_type_distribution()
-        equipment = dataset.equipment.all()
+        equipment = list(
+            Equipment.objects
+            .filter(dataset_id=dataset.pk)
+            .order_by('id')
+            .values_list('flowrate', 'pressure', 'temperature')[:10]
+        )
         
         # Chart 1: Equipment Type Distribution (Pie)
         axes[0, 0].pie(
@@ -221,9 +287,9 @@ def generate_charts(dataset):
         
         # Chart 4: Parameter Comparison (if enough data)
         if len(equipment) > 0:
-            flowrates = [e.flowrate for e in equipment[:10]]
-            pressures = [e.pressure for e in equipment[:10]]
-            temperatures = [e.temperature for e in equipment[:10]]
+            flowrates = [row[0] for row in equipment]
+            pressures = [row[1] for row in equipment]
+            temperatures = [row[2] for row in equipment]
             x = range(len(flowrates))
             
             axes[1, 1].plot(x, flowrates, marker='o', label='Flowrate', color='#3498db')
@@ -237,21 +303,18 @@ def generate_charts(dataset):
         
         plt.tight_layout()
         
-        # Save chart
-        charts_dir = os.path.join(settings.MEDIA_ROOT, 'charts')
-        os.makedirs(charts_dir, exist_ok=True)
-        
-        chart_filename = f'chart_{dataset.id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.png'
-        chart_path = os.path.join(charts_dir, chart_filename)
-        
-        plt.savefig(chart_path, dpi=150, bbox_inches='tight')
-        plt.close()
-        
-        return chart_path
+        # Render into a buffer; nothing is written to disk
+        chart_png = io.BytesIO()
+        fig.savefig(chart_png, format='png', dpi=150, bbox_inches='tight')
+        chart_png.seek(0)
+        return chart_png
         
     except Exception as e:
         print(f"Error generating charts: {e}")
         return None
+    finally:
+        if fig is not None:
+            plt.close(fig)
 
 
 def process_csv_file(csv_file):
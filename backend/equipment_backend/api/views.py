@@ -1,17 +1,36 @@
 from rest_framework import status, viewsets
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.authtoken.models import Token
+from django.conf import settings
 from django.contrib.auth import authenticate
-from django.http import FileResponse
-from .models import Dataset, Equipment
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition
+from .models import Dataset, Equipment, IngestJob, TypeSummary
 from .serializers import (
     DatasetSerializer, DatasetListSerializer, 
-    EquipmentSerializer, RegisterSerializer, UserSerializer
+    EquipmentSerializer, IngestJobSerializer, RegisterSerializer, TypeSummarySerializer,
+    UserSerializer
 )
-from .utils import process_csv_file, generate_pdf_report
-import pandas as pd
+from .utils import DETAIL_LEVELS
+from .ingest import IngestError, append_csv, find_duplicate, get_content_hash, ingest_csv
+from .retention import enforce_retention, retained_datasets
+from .authentication import get_token_cache
+from .conditional import (
+    dataset_etag, dataset_last_modified, dataset_list_etag,
+    dataset_list_last_modified, report_etag
+)
+from .jobs import enqueue_upload, get_live_progress
+from .export import EXPORT_WRITERS, get_export_renderers
+from .pagination import EquipmentCursorPagination
+from .profiling import span
+from .report_cache import open_report
+from .batch import BatchError, ingest_batch
+from .compare import compare_datasets, get_max_datasets
+from .series import DEFAULT_POINTS, METHODS, PARAMETERS, get_max_points, get_series
+from .report_pool import ReportTimeout
 import os
 
 
@@ -54,14 +73,108 @@ def login(request):
 @permission_classes([IsAuthenticated])
 def logout(request):
     """Logout user by deleting token"""
-    request.user.auth_token.delete()
+    # Deleting the token also drops it from the authentication cache
+    request.auth.delete()
     return Response({'message': 'Successfully logged out'})
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def upload_csv(request):
-    """Upload and process CSV file"""
+    """
+    Upload and process CSV file.
+    Send 'Prefer: respond-async' (or enable INGEST_ASYNC_UPLOADS) to have
+    the file ingested in the background; the response is then 202 with a job id.
+    """
+    data, status_code, headers = process_upload(request, request.FILES.get('file'))
+    return Response(data, status=status_code, headers=headers)
+
+
+def process_upload(request, csv_file):
+    """
+    Validate and ingest (or queue) an uploaded CSV.
+    Shared by the sync and async upload views; returns (data, status, headers).
+    """
+    if csv_file is None:
+        return {'error': 'No file provided'}, status.HTTP_400_BAD_REQUEST, None
+    
+    # Validate file extension
+    if not csv_file.name.endswith('.csv'):
+        return {'error': 'File must be a CSV'}, status.HTTP_400_BAD_REQUEST, None
+    
+    # Identical re-uploads return the dataset that already holds the content
+    content_hash = get_content_hash(csv_file)
+    duplicate = find_duplicate(request.user, content_hash)
+    if duplicate:
+        return DatasetListSerializer(duplicate).data, status.HTTP_200_OK, None
+    
+    if wants_async_ingest(request):
+        job = enqueue_upload(csv_file, request.user, content_hash)
+        status_url = request.build_absolute_uri(
+            reverse('ingest_job_detail', args=[job.pk])
+        )
+        return (
+            {'job_id': job.pk, 'status': job.status, 'status_url': status_url},
+            status.HTTP_202_ACCEPTED,
+            {'Location': status_url}
+        )
+    
+    try:
+        # Stream the CSV into a new dataset chunk by chunk
+        dataset = ingest_csv(
+            csv_file, request.user, csv_file.name, content_hash=content_hash
+        )
+        
+        # Drop datasets that fall outside the retention policy
+        with span('retention'):
+            enforce_retention(request.user)
+        
+        # Return the dataset summary; the rows are fetched from
+        # datasets/<pk>/ or datasets/<pk>/equipment/ when needed
+        with span('serialize'):
+            data = DatasetListSerializer(dataset).data
+        return data, status.HTTP_201_CREATED, None
+        
+    except IngestError as e:
+        return {'error': str(e)}, status.HTTP_400_BAD_REQUEST, None
+    except Exception as e:
+        return {'error': f'Error processing CSV: {str(e)}'}, status.HTTP_400_BAD_REQUEST, None
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_upload(request):
+    """
+    Upload several CSV files (as 'files') and/or ZIP archives of them in
+    one request. Each CSV becomes its own dataset; the response lists the
+    outcome per file in upload order.
+    """
+    data, status_code = process_batch_upload(request)
+    return Response(data, status=status_code)
+
+
+def process_batch_upload(request):
+    """Shared by the sync and async batch upload views; returns (data, status)"""
+    uploaded_files = request.FILES.getlist('files') + request.FILES.getlist('file')
+    try:
+        results = ingest_batch(uploaded_files, request.user, lambda d: DatasetListSerializer(d).data)
+    except BatchError as e:
+        return {'error': str(e)}, status.HTTP_400_BAD_REQUEST
+    return {'results': results}, status.HTTP_200_OK
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def append_csv_rows(request, pk):
+    """Append the rows of a CSV file to an existing dataset"""
+    try:
+        dataset = Dataset.objects.get(pk=pk, user=request.user)
+    except Dataset.DoesNotExist:
+        return Response(
+            {'error': 'Dataset not found'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
     if 'file' not in request.FILES:
         return Response(
             {'error': 'No file provided'}, 
@@ -78,64 +191,15 @@ def upload_csv(request):
         )
     
     try:
-        # Process CSV file
-        df = pd.read_csv(csv_file)
-        
-        # Validate required columns
-        required_columns = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-        if not all(col in df.columns for col in required_columns):
-            return Response(
-                {'error': f'CSV must contain columns: {", ".join(required_columns)}'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Calculate statistics
-        stats = {
-            'total_count': len(df),
-            'avg_flowrate': float(df['Flowrate'].mean()),
-            'avg_pressure': float(df['Pressure'].mean()),
-            'avg_temperature': float(df['Temperature'].mean()),
-            'type_distribution': df['Type'].value_counts().to_dict()
-        }
-        
-        # Create Dataset
-        dataset = Dataset.objects.create(
-            user=request.user,
-            filename=csv_file.name,
-            total_count=stats['total_count'],
-            avg_flowrate=stats['avg_flowrate'],
-            avg_pressure=stats['avg_pressure'],
-            avg_temperature=stats['avg_temperature']
-        )
-        dataset.set_type_distribution(stats['type_distribution'])
-        dataset.save()
-        
-        # Create Equipment records
-        equipment_list = []
-        for _, row in df.iterrows():
-            equipment = Equipment(
-                dataset=dataset,
-                equipment_name=row['Equipment Name'],
-                equipment_type=row['Type'],
-                flowrate=float(row['Flowrate']),
-                pressure=float(row['Pressure']),
-                temperature=float(row['Temperature'])
-            )
-            equipment_list.append(equipment)
-        
-        Equipment.objects.bulk_create(equipment_list)
-        
-        # Keep only last 5 datasets per user
-        user_datasets = Dataset.objects.filter(user=request.user)
-        if user_datasets.count() > 5:
-            datasets_to_delete = user_datasets[5:]
-            for ds in datasets_to_delete:
-                ds.delete()
-        
-        # Return dataset with equipment data
-        serializer = DatasetSerializer(dataset)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        dataset = append_csv(csv_file, dataset)
+        serializer = DatasetListSerializer(dataset)
+        return Response(serializer.data)
         
+    except IngestError as e:
+        return Response(
+            {'error': str(e)}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         return Response(
             {'error': f'Error processing CSV: {str(e)}'}, 
@@ -143,17 +207,47 @@ def upload_csv(request):
         )
 
 
+def wants_async_ingest(request):
+    """Check whether an upload should be handed to the background queue"""
+    if getattr(settings, 'INGEST_ASYNC_UPLOADS', False):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+def ingest_job_detail(request, pk):
+    """Get status and progress of a background CSV ingestion job"""
+    try:
+        job = IngestJob.objects.get(pk=pk, user=request.user)
+    except IngestJob.DoesNotExist:
+        return Response(
+            {'error': 'Job not found'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    data = IngestJobSerializer(job).data
+    
+    # Running jobs report live row counts from the worker
+    live = job.status == IngestJob.STATUS_RUNNING and get_live_progress(job.pk)
+    if live:
+        data['rows_parsed'], data['rows_inserted'] = live
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@condition(etag_func=dataset_list_etag, last_modified_func=dataset_list_last_modified)
 def dataset_list(request):
-    """Get list of user's datasets (last 5)"""
-    datasets = Dataset.objects.filter(user=request.user)[:5]
+    """Get list of the user's datasets kept by the retention policy"""
+    datasets = retained_datasets(request.user)
     serializer = DatasetListSerializer(datasets, many=True)
     return Response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=dataset_etag, last_modified_func=dataset_last_modified)
 def dataset_detail(request, pk):
     """Get detailed dataset with equipment data"""
     try:
@@ -167,6 +261,176 @@ def dataset_detail(request, pk):
         )
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dataset_summary(request, pk):
+    """Get dataset statistics without equipment data"""
+    try:
+        dataset = Dataset.objects.get(pk=pk, user=request.user)
+        serializer = DatasetListSerializer(dataset)
+        return Response(serializer.data)
+    except Dataset.DoesNotExist:
+        return Response(
+            {'error': 'Dataset not found'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dataset_stats(request, pk):
+    """Get per equipment type statistics computed when the dataset was ingested"""
+    try:
+        dataset = Dataset.objects.get(pk=pk, user=request.user)
+    except Dataset.DoesNotExist:
+        return Response(
+            {'error': 'Dataset not found'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    summaries = TypeSummary.objects.filter(dataset=dataset)
+    return Response({
+        'id': dataset.id,
+        'total_count': dataset.total_count,
+        'avg_flowrate': dataset.avg_flowrate,
+        'avg_pressure': dataset.avg_pressure,
+        'avg_temperature': dataset.avg_temperature,
+        'types': TypeSummarySerializer(summaries, many=True).data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dataset_series(request, pk):
+    """
+    Get a downsampled series of one parameter for charting.
+    Query params: parameter (flowrate, pressure, temperature),
+    points (target point count) and method (lttb or minmax).
+    """
+    try:
+        dataset = Dataset.objects.get(pk=pk, user=request.user)
+    except Dataset.DoesNotExist:
+        return Response(
+            {'error': 'Dataset not found'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    parameter = request.query_params.get('parameter', 'flowrate')
+    method = request.query_params.get('method', 'lttb')
+    if parameter not in PARAMETERS:
+        return Response(
+            {'error': f'parameter must be one of: {", ".join(PARAMETERS)}'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if method not in METHODS:
+        return Response(
+            {'error': f'method must be one of: {", ".join(METHODS)}'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    max_points = get_max_points()
+    try:
+        points = int(request.query_params.get('points', DEFAULT_POINTS))
+    except ValueError:
+        points = 0
+    if not 3 <= points <= max_points:
+        return Response(
+            {'error': f'points must be an integer between 3 and {max_points}'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response(get_series(dataset, parameter, points, method))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dataset_compare(request):
+    """
+    Compare datasets side by side.
+    Query param: ids (comma separated dataset ids, the first is the
+    baseline deltas are taken against).
+    """
+    max_datasets = get_max_datasets()
+    try:
+        ids = [int(i) for i in request.query_params.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        ids = []
+    ids = list(dict.fromkeys(ids))
+    if not 2 <= len(ids) <= max_datasets:
+        return Response(
+            {'error': f'ids must list between 2 and {max_datasets} distinct dataset ids'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    datasets = Dataset.objects.filter(user=request.user).in_bulk(ids)
+    missing = [i for i in ids if i not in datasets]
+    if missing:
+        return Response(
+            {'error': f'Dataset not found: {", ".join(map(str, missing))}'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    return Response(compare_datasets([datasets[i] for i in ids]))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dataset_equipment(request, pk):
+    """
+    Get one page of a dataset's equipment rows.
+    Supports ?cursor=, ?page_size=, ?ordering=<field|-field> and
+    ?fields=<comma separated list> to pick the returned columns.
+    """
+    if not Dataset.objects.filter(pk=pk, user=request.user).exists():
+        return Response(
+            {'error': 'Dataset not found'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    fields = None
+    if request.query_params.get('fields'):
+        fields = [f.strip() for f in request.query_params['fields'].split(',') if f.strip()]
+        unknown = set(fields) - set(EquipmentSerializer.Meta.fields)
+        if unknown:
+            return Response(
+                {'error': f'Unknown fields: {", ".join(sorted(unknown))}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    paginator = EquipmentCursorPagination()
+    queryset = Equipment.objects.filter(dataset_id=pk)
+    if fields:
+        # Load only the requested columns plus whatever the cursor orders by
+        ordering = paginator.get_ordering(request, queryset, None)
+        queryset = queryset.only(*set(fields) | {o.lstrip('-') for o in ordering})
+    
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = EquipmentSerializer(page, many=True, fields=fields)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(get_export_renderers())
+def dataset_export(request, pk):
+    """
+    Stream a dataset's equipment columns in a binary columnar format.
+    The format is picked from the Accept header (or ?format=):
+    Arrow IPC stream, Parquet or NumPy .npz.
+    """
+    if not Dataset.objects.filter(pk=pk, user=request.user).exists():
+        return Response(
+            {'error': 'Dataset not found'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    renderer = request.accepted_renderer
+    writer, extension = EXPORT_WRITERS[renderer.format]
+    response = StreamingHttpResponse(writer(pk), content_type=renderer.media_type)
+    response['Content-Disposition'] = f'attachment; filename="dataset_{pk}.{extension}"'
+    return response
+
+
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def dataset_delete(request, pk):
@@ -184,17 +448,28 @@ def dataset_delete(request, pk):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=report_etag, last_modified_func=dataset_last_modified)
 def generate_report(request, pk):
-    """Generate PDF report for a dataset"""
+    """
+    Generate PDF report for a dataset.
+    ?detail=full lists every equipment row instead of the first 20.
+    """
+    detail = request.query_params.get('detail', 'summary')
+    if detail not in DETAIL_LEVELS:
+        return Response(
+            {'error': f"detail must be one of: {', '.join(DETAIL_LEVELS)}"}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
     try:
         dataset = Dataset.objects.get(pk=pk, user=request.user)
         
-        # Generate PDF
-        pdf_path = generate_pdf_report(dataset)
+        # Reuse the cached PDF unless the dataset changed
+        report = open_report(dataset, detail)
         
         # Return PDF file
         return FileResponse(
-            open(pdf_path, 'rb'), 
+            report, 
             as_attachment=True, 
             filename=f'report_{dataset.filename}.pdf'
         )
@@ -204,6 +479,11 @@ def generate_report(request, pk):
             {'error': 'Dataset not found'}, 
             status=status.HTTP_404_NOT_FOUND
         )
+    except ReportTimeout as e:
+        return Response(
+            {'error': str(e)}, 
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
     except Exception as e:
         return Response(
             {'error': f'Error generating report: {str(e)}'}, 
@@ -216,4 +496,11 @@ def generate_report(request, pk):
 def current_user(request):
     """Get current user info"""
     serializer = UserSerializer(request.user)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def auth_cache_stats(request):
+    """Hit rate and size of this process's token authentication cache"""
+    return Response(get_token_cache().stats())
@@ -34,8 +34,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.ProfilingMiddleware',
+    'api.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,6 +77,29 @@ DATABASES = {
     }
 }
 
+# SQLite production profile (opt-in with SQLITE_PRODUCTION_PROFILE=1)
+# WAL lets readers carry on while an upload's insert transaction is open,
+# and connections are kept open between requests instead of reopened
+if os.environ.get('SQLITE_PRODUCTION_PROFILE', '') == '1':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA cache_size=-65536;'      # 64 MiB page cache
+                'PRAGMA mmap_size=268435456;'    # 256 MiB memory-mapped I/O
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            # Seconds to wait for a lock before 'database is locked'
+            'timeout': 20,
+            # Writers take the write lock up front, so two transactions
+            # never deadlock upgrading from read to write
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -122,11 +148,15 @@ CORS_ALLOWED_ORIGINS = [
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # Media Files
@@ -136,4 +166,119 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Create media directories
 os.makedirs(os.path.join(BASE_DIR, 'media', 'uploads'), exist_ok=True)
 os.makedirs(os.path.join(BASE_DIR, 'media', 'reports'), exist_ok=True)
-os.makedirs(os.path.join(BASE_DIR, 'media', 'charts'), exist_ok=True)
+
+# CSV ingestion
+# Uploads are parsed and inserted this many rows at a time
+CSV_INGEST_CHUNK_SIZE = int(os.environ.get('CSV_INGEST_CHUNK_SIZE', 50000))
+# 'columnar' inserts straight from the parsed columns, 'orm' builds an
+# Equipment instance per row (kept for comparing rows/sec on the same file)
+CSV_INGEST_INSERT_MODE = os.environ.get('CSV_INGEST_INSERT_MODE', 'columnar')
+
+# Background ingestion
+# Worker threads that ingest uploads queued with 'Prefer: respond-async'
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 2))
+# Queue every upload and answer 202 Accepted, even without the Prefer header
+INGEST_ASYNC_UPLOADS = os.environ.get('INGEST_ASYNC_UPLOADS', '') == '1'
+# Running jobs publish their row counts through CACHES, which doubles as
+# their heartbeat. With several server processes CACHES must be shared
+# (e.g. Redis) for a status poll answered by another process to see live
+# counts. When a queue starts it fails running jobs whose process has
+# exited, or, for processes on other hosts, that have not reported
+# progress for this many seconds
+INGEST_HEARTBEAT_TIMEOUT = int(os.environ.get('INGEST_HEARTBEAT_TIMEOUT', 60))
+
+# PDF report cache
+# Rendered reports are reused until their dataset changes; least recently
+# used files are evicted once the directory grows past this size
+REPORT_CACHE_DIR = os.path.join(MEDIA_ROOT, 'reports')
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+# 'disk' keeps the cache above; 'memory' renders every report into memory
+# and streams it from there, so no report file is ever written
+REPORT_STORAGE = os.environ.get('REPORT_STORAGE', 'disk')
+
+# Report rendering
+# Reports are rendered in a pool of worker processes so matplotlib and
+# ReportLab never run on request threads; 0 renders in the request thread
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+# Seconds a request waits for a report before giving up
+REPORT_RENDER_TIMEOUT = int(os.environ.get('REPORT_RENDER_TIMEOUT', 60))
+
+# Batch uploads
+# CSVs of a batch upload are parsed in parallel in this many worker
+# processes; 0 parses them in the request thread
+BATCH_UPLOAD_WORKERS = int(os.environ.get('BATCH_UPLOAD_WORKERS', min(4, os.cpu_count() or 1)))
+# Seconds to wait for the next file of a batch to be parsed; a file that
+# takes longer (e.g. because its worker died) fails and the pool is restarted
+BATCH_PARSE_TIMEOUT = int(os.environ.get('BATCH_PARSE_TIMEOUT', 300))
+# Most CSV files one batch (including the contents of ZIP archives) may hold
+BATCH_UPLOAD_MAX_FILES = 50
+# Total uncompressed size of the CSVs in one batch
+BATCH_UPLOAD_MAX_BYTES = int(os.environ.get('BATCH_UPLOAD_MAX_BYTES', 500 * 1024 * 1024))
+
+# Per-type statistics
+# Rows sampled per equipment type at ingest to estimate percentiles
+TYPE_STATS_SAMPLE_SIZE = int(os.environ.get('TYPE_STATS_SAMPLE_SIZE', 10000))
+
+# Dataset retention
+# Any of the limits can be None to disable it
+DATASET_RETENTION = {
+    'max_datasets': 5,
+    'max_age_days': None,
+    'max_total_rows': None,
+}
+# 'inline' prunes right after each upload, 'background' on a worker thread,
+# 'periodic' leaves it to `python manage.py compact_datasets`
+DATASET_RETENTION_MODE = os.environ.get('DATASET_RETENTION_MODE', 'inline')
+
+# File uploads
+# Same as Django's defaults, but each file's SHA-256 is computed as it
+# arrives so duplicate uploads can be spotted without re-reading them
+FILE_UPLOAD_HANDLERS = [
+    'api.upload_handlers.HashingMemoryFileUploadHandler',
+    'api.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
+# Chart series
+# Largest point count a client may ask datasets/<pk>/series/ for
+SERIES_MAX_POINTS = 10000
+# Seconds a downsampled series stays cached
+SERIES_CACHE_TIMEOUT = 60 * 60
+
+# Dataset comparison
+# Most datasets datasets/compare/?ids= compares at once
+DATASET_COMPARE_MAX = int(os.environ.get('DATASET_COMPARE_MAX', 5))
+
+# Response compression
+# JSON responses at least this large are compressed with brotli (if the
+# Brotli package is installed) or gzip; smaller ones are sent as-is
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get('RESPONSE_COMPRESSION_MIN_SIZE', 16 * 1024))
+RESPONSE_COMPRESSION_GZIP_LEVEL = 6
+RESPONSE_COMPRESSION_BROTLI_QUALITY = 5
+
+# Token authentication cache
+# Token lookups are cached per process for this many seconds. Logout and
+# user changes invalidate entries right away in the process that made
+# them, and in the other processes through markers in Django's cache when
+# CACHES is shared between them (e.g. Redis); with the default per-process
+# cache, other processes may accept a revoked token for up to this long
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 5))
+# Most tokens kept in the cache; least recently used ones are dropped first
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 1024))
+
+# Request profiling
+# Adds a Server-Timing header (total, SQL and named spans such as parse,
+# insert, serialize, charts, pdf) and logs the same as JSON per request.
+# When off the middleware removes itself at startup.
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', '') == '1'
+
+# Prometheus metrics
+# /metrics is only served to these addresses. With several server
+# processes, set the PROMETHEUS_MULTIPROC_DIR environment variable to a
+# shared empty directory so the endpoint aggregates all of them.
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Async views
+# Serve uploads, reports and dataset reads with async views. Meant for
+# ASGI servers (e.g. `uvicorn equipment_backend.asgi:application`), where
+# slow clients then no longer hold a worker thread each
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', '') == '1'
@@ -15,10 +15,38 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import json
+from collections import OrderedDict
 
 
 API_URL = "http://localhost:8000/api"
 
+# ETag and body of recent responses per (token, URL), reused when the
+# server answers 304; least recently used entries are dropped first
+ETAG_CACHE_SIZE = 16
+_etag_cache = OrderedDict()
+
+
+def conditional_get(url, token):
+    """GET with If-None-Match; answers with the cached body if unchanged"""
+    key = (token, url)
+    headers = {"Authorization": f"Token {token}"}
+    cached = _etag_cache.get(key)
+    if cached is not None:
+        headers["If-None-Match"] = cached[0]
+        _etag_cache.move_to_end(key)
+
+    response = requests.get(url, headers=headers)
+    if response.status_code == 304 and cached is not None:
+        response.status_code = 200
+        response._content = cached[1]
+        return response
+    if response.status_code == 200 and "ETag" in response.headers:
+        _etag_cache[key] = (response.headers["ETag"], response.content)
+        _etag_cache.move_to_end(key)
+        while len(_etag_cache) > ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+    return response
+
 
 class LoginWindow(QWidget):
     """Login/Register Window"""
@@ -195,10 +223,7 @@ class DashboardTab(QWidget):
     
     def load_dashboard(self):
         try:
-            response = requests.get(
-                f"{API_URL}/datasets/",
-                headers={"Authorization": f"Token {self.token}"}
-            )
+            response = conditional_get(f"{API_URL}/datasets/", self.token)
             
             if response.status_code == 200:
                 datasets = response.json()
@@ -373,7 +398,7 @@ class UploadTab(QWidget):
                     files=files
                 )
             
-            if response.status_code == 201:
+            if response.status_code in (200, 201):
                 QMessageBox.information(self, "Success", "File uploaded successfully!")
                 self.selected_file = None
                 self.file_label.setText("No file selected")
@@ -414,10 +439,7 @@ class HistoryTab(QWidget):
     
     def load_history(self):
         try:
-            response = requests.get(
-                f"{API_URL}/datasets/",
-                headers={"Authorization": f"Token {self.token}"}
-            )
+            response = conditional_get(f"{API_URL}/datasets/", self.token)
             
             if response.status_code == 200:
                 datasets = response.json()
@@ -464,10 +486,7 @@ class HistoryTab(QWidget):
     
     def download_pdf(self, dataset):
         try:
-            response = requests.get(
-                f"{API_URL}/datasets/{dataset['id']}/report/",
-                headers={"Authorization": f"Token {self.token}"}
-            )
+            response = conditional_get(f"{API_URL}/datasets/{dataset['id']}/report/", self.token)
             
             if response.status_code == 200:
                 filename, _ = QFileDialog.getSaveFileName(
@@ -516,10 +535,7 @@ class DatasetDetailDialog(QMessageBox):
     
     def load_details(self):
         try:
-            response = requests.get(
-                f"{API_URL}/datasets/{self.dataset_id}/",
-                headers={"Authorization": f"Token {self.token}"}
-            )
+            response = conditional_get(f"{API_URL}/datasets/{self.dataset_id}/", self.token)
             
             if response.status_code == 200:
                 dataset = response.json()
@@ -595,6 +611,7 @@ class MainWindow(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
+            _etag_cache.clear()
             self.close()
             QApplication.quit()
 